@@ -0,0 +1,33 @@
+import sys
+import logging
+from pathlib import Path
+
+import pytest
+
+# app modules import each other by bare name, as they are run from `tracker_app/`
+sys.path.insert(0, str(Path(__file__).parent.parent / "tracker_app"))
+
+from model import Model
+
+
+@pytest.fixture
+def make_model(tmp_path):
+    """Creates models logging to `test`, stored in `tmp_path / "data.csv"` unless `data_path` is given.
+    Every model is closed after the test, so no background thread outlives it."""
+    models = []
+
+    def make(data_path: Path = None, **kwargs) -> Model:
+        model = Model(
+            _data_path=data_path or tmp_path / "data.csv", _logger=logging.getLogger("test"), **kwargs
+        )
+        models.append(model)
+        return model
+
+    yield make
+    for model in models:
+        model.close(timeout=5)
+
+
+@pytest.fixture
+def model(make_model) -> Model:
+    return make_model()
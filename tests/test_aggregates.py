@@ -0,0 +1,50 @@
+import calendar
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import Aggregates
+from model import FIELDS
+
+NUMERIC = [field for field in FIELDS if field != "date"]
+
+
+class TestAggregates:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        self.model = model
+        rng = np.random.default_rng(1)
+        today = self.model.date
+        for offset in rng.integers(0, 60, size=80):
+            # repeated offsets overwrite already stored days
+            self.model._Model__change_date(today - pd.Timedelta(days=int(offset)))
+            self.model.sleep_time = rng.integers(3, 10)
+            self.model.gym = bool(rng.integers(0, 2))
+            self.model.overall_score = rng.integers(0, 6)
+            self.model.save()
+
+    @pytest.mark.parametrize("group", Aggregates.GROUPS)
+    def test_incremental_matches_rebuild(self, group):
+        rebuilt = Aggregates.from_frame(self.model._data, NUMERIC)
+        for field in ("sleep_time", "gym", "overall_score"):
+            pd.testing.assert_frame_equal(
+                self.model.stats.table(group, field), rebuilt.table(group, field)
+            )
+
+    def test_weekday_table_matches_groupby(self):
+        df = self.model._data
+        table = self.model.stats.table("weekday", "sleep_time")
+        expected = df.groupby(df["date"].dt.day_name())["sleep_time"].agg(["mean", "std", "count"])
+        expected = expected.loc[table.index]
+        np.testing.assert_allclose(table["mean"], expected["mean"].astype(float))
+        np.testing.assert_allclose(table["std"], expected["std"].astype(float))
+        assert (table["count"] == expected["count"]).all()
+        assert list(table.index) == [day for day in calendar.day_name if day in table.index]
+
+    def test_month_counts(self):
+        table = self.model.stats.table("month", "gym")
+        assert table["count"].sum() == len(self.model._data)
+        months = self.model._data["date"].dt.strftime("%Y-%m")
+        np.testing.assert_allclose(
+            table["mean"], self.model._data.groupby(months)["gym"].mean()
+        )
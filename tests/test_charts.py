@@ -0,0 +1,81 @@
+import pytest
+from concurrent.futures import Future
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("seaborn")
+
+import charts
+import downsample
+from charts import ChartCache
+
+PNG_MAGIC = b"\x89PNG"
+
+
+class TestChartCache:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.cache = ChartCache(max_size=2)
+        self.submitted = []
+
+    def submit(self) -> Future:
+        future = Future()
+        self.submitted.append(future)
+        return future
+
+    def test_hit_does_not_render(self):
+        future = self.cache.get("a_chart", 0, (10, 10), self.submit)
+        assert self.cache.get("a_chart", 0, (10, 10), self.submit) is future
+        assert len(self.submitted) == 1
+
+    def test_new_version_replaces_stale_chart(self):
+        self.cache.get("a_chart", 0, (10, 10), self.submit)
+        self.cache.get("b_chart", 0, (10, 10), self.submit)
+        self.cache.get("a_chart", 1, (10, 10), self.submit)
+        assert len(self.submitted) == 3
+        assert self.submitted[0].cancelled()
+        assert not self.submitted[1].cancelled()
+        assert len(self.cache) == 2
+
+    def test_lru_eviction(self):
+        self.cache.get("a_chart", 0, (10, 10), self.submit)
+        self.cache.get("b_chart", 0, (10, 10), self.submit)
+        self.cache.get("a_chart", 0, (10, 10), self.submit)
+        self.cache.get("c_chart", 0, (10, 10), self.submit)
+        assert len(self.cache) == 2
+        assert not self.submitted[0].cancelled()
+        assert self.submitted[1].cancelled()
+
+
+class TestRender:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        for hours in range(10):
+            model.sleep_time = hours
+            model.overall_score = hours % 5
+            model.save()
+            model.go_to_previous_day()
+        self.data = model.stats.table("overall_score", "sleep_time")
+        self.habits = model.habits
+        self.correlations = model.correlations.snapshot()
+        self.trend = downsample.series(
+            "sleep_time", model.column("date"), model.column("sleep_time"), 300
+        )
+
+    @pytest.mark.parametrize("plot", [charts.sleep_time_per_weekday, charts.score_vs_sleep_time])
+    def test_render_png(self, plot):
+        png = charts.render(plot, self.data, (300, 200))
+        assert png.startswith(PNG_MAGIC)
+
+    def test_render_tables(self):
+        for plot, data in [
+            (charts.habit_streaks, self.habits.streak_table()),
+            (charts.counter_frequency, self.habits.frequency_table()),
+            (charts.score_correlations, self.correlations),
+            (charts.trend, self.trend),
+        ]:
+            assert charts.render(plot, data, (300, 200)).startswith(PNG_MAGIC)
+
+    def test_render_in_worker_process(self):
+        with charts.process_pool(max_workers=1) as pool:
+            future = pool.submit(charts.render, charts.score_vs_sleep_time, self.data, (300, 200))
+            assert future.result(timeout=60).startswith(PNG_MAGIC)
@@ -0,0 +1,82 @@
+import pickle
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlations import Correlations
+from model import FIELDS
+
+NUMERIC = [field for field in FIELDS if field != "date"]
+
+
+class TestCorrelations:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        self.model = model
+        rng = np.random.default_rng(5)
+        today = self.model.date
+        # repeated offsets edit stored days, gaps leave some lags unpaired
+        for offset in rng.integers(0, 60, size=90):
+            self.model._Model__change_date(today - pd.Timedelta(days=int(offset)))
+            self.model.sleep_time = rng.integers(3, 10)
+            self.model.gym = bool(rng.integers(0, 2))
+            self.model.overall_score = min(5, int(self.model.sleep_time) // 2 + rng.integers(0, 2))
+            self.model.save()
+        self.frame = self.model._data.set_index("date")[NUMERIC].astype(float)
+
+    def lagged(self, lag: int) -> tuple:
+        later = self.frame.shift(-lag, freq="D").reindex(self.frame.index)
+        paired = later.notna().all(axis=1)
+        return self.frame[paired], later[paired]
+
+    @pytest.mark.parametrize("lag", [0, 1, 3])
+    def test_incremental_pearson_matches_rebuild(self, lag):
+        rebuilt = Correlations.from_frame(self.model._data, NUMERIC)
+        pd.testing.assert_frame_equal(
+            self.model.correlations.pearson(lag), rebuilt.pearson(lag), atol=1e-9
+        )
+
+    @pytest.mark.parametrize("lag", [0, 2])
+    def test_match_pandas(self, lag):
+        first, second = self.lagged(lag)
+        expected = first["sleep_time"].corr(second["overall_score"])
+        r = self.model.correlations.pearson(lag).loc["sleep_time", "overall_score"]
+        assert r == pytest.approx(expected)
+        # spearman is pearson of the ranks (pandas needs scipy for method="spearman")
+        expected = first["sleep_time"].rank().corr(second["overall_score"].rank())
+        r = self.model.correlations.spearman(lag).loc["sleep_time", "overall_score"]
+        assert r == pytest.approx(expected)
+
+    def test_constant_field_has_no_correlation(self):
+        assert np.isnan(self.model.correlations.pearson(0).loc["alcohol", "overall_score"])
+
+    def test_summary(self):
+        summary = self.model.correlations.summary("overall_score")
+        assert set(summary["lag"]) == {0, 1, 2, 3}
+        assert "overall_score" not in set(summary["field"])
+        row = summary[(summary["field"] == "sleep_time") & (summary["lag"] == 0)].iloc[0]
+        assert row["low"] <= row["pearson"] <= row["high"]
+        assert row["low"] > 0
+        # cached until the next save
+        assert self.model.correlations.summary("overall_score") is summary
+        self.model.save()
+        assert self.model.correlations.summary("overall_score") is not summary
+
+    def test_snapshot_is_independent(self):
+        snapshot = pickle.loads(pickle.dumps(self.model.correlations.snapshot()))
+        pd.testing.assert_frame_equal(snapshot.pearson(1), self.model.correlations.pearson(1))
+        pd.testing.assert_frame_equal(snapshot.spearman(1), self.model.correlations.spearman(1))
+        self.model._Model__change_date(self.model.date + pd.Timedelta(days=1))
+        self.model.sleep_time = 9
+        self.model.save()
+        assert not snapshot.pearson(0).equals(self.model.correlations.pearson(0))
+
+
+def test_small_history_has_no_warnings():
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": [2.0, 1.0], "date": pd.date_range("2023-01-01", periods=2)})
+    correlations = Correlations.from_frame(df, ["a", "b"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        summary = correlations.summary("b")
+    assert summary["spearman"].isna().all()
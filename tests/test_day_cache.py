@@ -0,0 +1,85 @@
+import logging
+import threading
+import pandas as pd
+import pytest
+
+from day_cache import DayCache
+
+TODAY = pd.Timestamp("2023-01-21")
+
+
+def day(offset: int) -> pd.Timestamp:
+    return TODAY + pd.Timedelta(days=offset)
+
+
+class TestDayCache:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.reads = []
+        self.cache = DayCache(self.read_day, logging.getLogger("test"), radius=3)
+        yield
+        self.cache.close(5)
+
+    def read_day(self, date):
+        self.reads.append(date)
+        return {"sleep_time": date.day} if date.day % 2 else None
+
+    def test_prefetch_fills_window(self):
+        self.cache.prefetch(TODAY)
+        assert self.cache.wait(5)
+        assert set(self.reads) == {day(i) for i in range(-3, 4)}
+        self.reads.clear()
+        assert self.cache.get(day(-2)) == {"sleep_time": 19}
+        assert self.cache.get(day(-3)) is None
+        assert self.cache.get(day(1)) is None
+        assert self.reads == []
+
+    def test_direction_of_travel_is_read_first(self):
+        self.cache.prefetch(TODAY, direction=-1)
+        assert self.cache.wait(5)
+        assert self.reads[:4] == [day(0), day(-1), day(-2), day(-3)]
+
+    def test_window_is_bounded(self):
+        for offset in range(20):
+            self.cache.prefetch(day(offset))
+            self.cache.wait(5)
+        assert len(self.cache) <= 2 * self.cache.radius + 1
+
+    def test_miss_reads_synchronously(self):
+        assert self.cache.get(day(100)) == {"sleep_time": 1}
+        assert self.reads == [day(100)]
+
+    def test_close_stops_thread(self):
+        self.cache.prefetch(TODAY)
+        self.cache.close(5)
+        assert not self.cache._thread.is_alive()
+        assert self.cache.get(day(100)) == {"sleep_time": 1}
+
+    def test_put_overrides(self):
+        self.cache.prefetch(TODAY)
+        self.cache.wait(5)
+        self.cache.put(TODAY, {"sleep_time": 1})
+        assert self.cache.get(TODAY) == {"sleep_time": 1}
+
+
+def test_model_navigation_uses_warm_cache(model, monkeypatch):
+    for hours in range(5):
+        model.sleep_time = hours
+        model.save()
+        model.go_to_previous_day()
+    for _ in range(5):
+        model.go_to_next_day()
+    model._days.wait(5)
+
+    # the background thread keeps reading the days entering the window, navigation must not
+    navigation = threading.get_ident()
+    reads = []
+
+    def read_day(date):
+        if threading.get_ident() == navigation:
+            reads.append(date)
+
+    monkeypatch.setattr(model._days, "_read_day", read_day)
+    seen = [model.go_to_previous_day() and float(model.sleep_time) for _ in range(5)]
+    assert seen == [1.0, 2.0, 3.0, 4.0, 0.0]
+    assert reads == []
@@ -0,0 +1,52 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import bucket_means, downsample, lttb, max_points, series
+
+
+def history(days: int) -> tuple:
+    dates = pd.date_range("2015-01-01", periods=days).to_numpy()
+    values = np.random.default_rng(0).normal(7, 1, size=days)
+    return dates, values
+
+
+@pytest.mark.parametrize("resolution, freq", [("week", "W-SUN"), ("month", "MS")])
+def test_bucket_means_match_pandas(resolution, freq):
+    dates, values = history(400)
+    # gaps in the history
+    dates, values = dates[::3], values[::3]
+    keys, means = bucket_means(dates, values, resolution)
+    expected = pd.Series(values, index=dates).resample(freq).mean().dropna()
+    np.testing.assert_allclose(means, expected.to_numpy())
+    assert len(keys) == len(expected)
+
+
+def test_lttb_keeps_shape():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[537] = 10
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 537 in keep
+
+
+@pytest.mark.parametrize(
+    "days, resolution", [(100, "day"), (600, "week"), (3000, "month"), (20000, "month")]
+)
+def test_points_are_bounded(days, resolution):
+    points = max_points(692)
+    dates, values = history(days)
+    sampled_dates, sampled_values, used = downsample(dates, values, points)
+    assert used == resolution
+    assert len(sampled_dates) == len(sampled_values) <= points
+    assert np.all(np.diff(sampled_dates) > np.timedelta64(0))
+
+
+def test_series_survives_pickle():
+    frame = series("sleep_time", *history(1000), width=692)
+    frame = pickle.loads(pickle.dumps(frame))
+    assert frame.attrs == {"field": "sleep_time", "resolution": "week"}
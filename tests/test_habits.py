@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from habits import Habits
+
+TODAY = pd.Timestamp.today().normalize()
+
+
+def longest_run(days: set) -> int:
+    best = run = 0
+    for day in range(min(days, default=0), max(days, default=-1) + 1):
+        run = run + 1 if day in days else 0
+        best = max(best, run)
+    return best
+
+
+class TestHabits:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        self.model = model
+
+    def save_day(self, offset: int, **values) -> None:
+        self.model._Model__change_date(TODAY - pd.Timedelta(days=offset))
+        self.model.set_default_values()
+        self.model.set_values(values)
+        self.model.save()
+
+    def test_streaks(self):
+        for offset in range(5):
+            self.save_day(offset, gym=True)
+        self.save_day(5, gym=False)
+        for offset in range(6, 14):
+            self.save_day(offset, gym=True)
+        habits = self.model.habits
+        assert habits.current("gym") == 5
+        assert habits.longest("gym") == 8
+        # no fast food on any of these days
+        assert habits.longest("fast_food") == 14
+        assert habits.current("code_tasks") == 0
+
+    def test_editing_a_past_day(self):
+        for offset in range(10):
+            self.save_day(offset, gym=True)
+        self.save_day(3, gym=False)
+        assert (self.model.habits.current("gym"), self.model.habits.longest("gym")) == (3, 6)
+        self.save_day(3, gym=True)
+        assert (self.model.habits.current("gym"), self.model.habits.longest("gym")) == (10, 10)
+
+    def test_current_streak_through_yesterday(self):
+        for offset in range(1, 4):
+            self.save_day(offset, code_tasks=True)
+        assert self.model.habits.current("code_tasks") == 3
+
+    def test_incremental_matches_rebuild(self):
+        rng = np.random.default_rng(7)
+        for offset in rng.integers(0, 40, size=120):
+            self.save_day(
+                int(offset),
+                gym=bool(rng.integers(0, 2)),
+                fast_food=bool(rng.integers(0, 2)),
+                alcohol=int(rng.integers(-1, 3)),
+            )
+        rebuilt = Habits.from_frame(self.model._data)
+        habits = self.model.habits
+        pd.testing.assert_frame_equal(habits.streak_table(), rebuilt.streak_table())
+        pd.testing.assert_frame_equal(habits.frequency_table(), rebuilt.frequency_table())
+        days = {d.toordinal() for d in self.model._data.loc[self.model._data["gym"], "date"]}
+        assert habits.longest("gym") == longest_run(days)
+
+    def test_frequency(self):
+        for offset, alcohol in enumerate([0, 0, 1, 2, -1]):
+            self.save_day(offset, alcohol=alcohol)
+        frequency = self.model.habits.frequency("alcohol")
+        assert frequency.to_dict() == {0: 0.5, 1: 0.25, 2: 0.25}
+        assert list(self.model.habits.frequency_table().index) == [
+            "alcohol",
+            "energy_drinks",
+            "bad_habits",
+        ]
@@ -0,0 +1,159 @@
+import json
+import pytest
+import numpy as np
+import pandas as pd
+
+from history import Change, EditHistory
+
+
+def frame(rows: dict) -> pd.DataFrame:
+    """`{day: sleep_time}` -> sorted data frame like the model's."""
+    return pd.DataFrame(
+        {
+            "sleep_time": np.array(list(rows.values()), dtype=np.float16),
+            "date": pd.to_datetime([f"2023-01-{day:02d}" for day in rows]),
+        }
+    ).sort_values(by="date", kind="stable").reset_index(drop=True)
+
+
+class TestChange:
+    def test_between_keeps_changed_fields(self):
+        date = pd.Timestamp("2023-01-01")
+        old = {"sleep_time": 7.0, "gym": True, "date": date}
+        new = {"sleep_time": 8.0, "gym": True, "date": date}
+        change = Change.between(date, old, new)
+        assert change.before == {"sleep_time": 7.0}
+        assert change.after == {"sleep_time": 8.0}
+        assert Change.between(date, old, dict(old)) is None
+
+    def test_to_json(self):
+        change = Change(pd.Timestamp("2023-01-01"), None, {"sleep_time": np.float16(7.5)})
+        entry = json.loads(change.to_json())
+        assert entry["date"] == "2023-01-01"
+        assert entry["before"] is None
+        assert entry["after"] == {"sleep_time": 7.5}
+
+
+class TestEditHistory:
+    def test_rebuilds_every_version(self):
+        rows = {1: 7.0}
+        history = EditHistory(checkpoint_every=3, max_checkpoints=2)
+        versions = [frame(rows)]
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            day = int(rng.integers(1, 6))
+            old = rows.get(day)
+            rows[day] = float(rng.integers(0, 12))
+            date = pd.Timestamp(f"2023-01-{day:02d}")
+            before = None if old is None else {"sleep_time": old}
+            after = {"sleep_time": rows[day]} if old is not None else {"sleep_time": rows[day], "date": date}
+            history.record([Change(date, before, after)], lambda: frame(rows))
+            versions.append(frame(rows))
+        # one checkpoint every 3 entries, only the last 2 are kept with the entries after them
+        assert sorted(history._checkpoints) == [6, 9]
+        assert history.oldest == 6 and len(history.entries) == 4
+        for version in range(6, 11):
+            pd.testing.assert_frame_equal(history.at(version, versions[-1]), versions[version])
+        for version in (5, 11):
+            with pytest.raises(ValueError):
+                history.at(version, versions[-1])
+        # the audit log still gets every change
+        assert len(history.unwritten()) == 10 and history.unwritten() == []
+
+    def test_undo_stops_at_oldest_version(self):
+        history = EditHistory(checkpoint_every=1, max_checkpoints=2)
+        date = pd.Timestamp("2023-01-01")
+        for hours in range(4):
+            history.record([Change(date, {"sleep_time": hours}, {"sleep_time": hours + 1})], lambda: frame({1: hours + 1}))
+        assert history.oldest == 3
+        assert history.undo(lambda change: None, lambda: frame({1: 3}))
+        assert not history.can_undo
+
+    def test_undo_redo_are_appended(self):
+        history = EditHistory()
+        date = pd.Timestamp("2023-01-01")
+        history.record([Change(date, {"sleep_time": 7.0}, {"sleep_time": 8.0})], lambda: frame({1: 8.0}))
+        [undone] = history.undo(lambda change: None, lambda: frame({1: 7.0}))
+        assert undone.after == {"sleep_time": 7.0}
+        assert not history.can_undo and history.can_redo
+        [redone] = history.redo(lambda change: None, lambda: frame({1: 8.0}))
+        assert redone.after == {"sleep_time": 8.0}
+        assert [c.kind for c in history.entries] == ["save", "undo", "redo"]
+        assert history.at(2, frame({1: 8.0})).loc[0, "sleep_time"] == 7.0
+        assert history.at(0, frame({1: 8.0})).loc[0, "sleep_time"] == 7.0
+        assert history.redo(lambda change: None, lambda: frame({})) == []
+
+    def test_batch_is_undone_together(self):
+        history = EditHistory(checkpoint_every=2)
+        changes = [
+            Change(pd.Timestamp(f"2023-01-0{day}"), None, {"sleep_time": 7.0, "date": pd.Timestamp(f"2023-01-0{day}")})
+            for day in (1, 2, 3)
+        ]
+        history.record(changes, lambda: frame({1: 7.0, 2: 7.0, 3: 7.0}))
+        # the checkpoint inside the batch is taken after it
+        assert sorted(history._checkpoints) == [3]
+        applied = []
+        undone = history.undo(lambda change: applied.append(change.date), lambda: frame({}))
+        assert applied == [c.date for c in reversed(changes)]
+        assert all(c.after is None for c in undone)
+        assert len(history.at(6, frame({}))) == 0 and len(history.at(3, frame({}))) == 3
+        assert len(history.at(0, frame({}))) == 0
+
+
+class TestModelUndo:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.data_path = tmp_path / "comfort_data.csv"
+        self.make_model = make_model
+        self.model = make_model(self.data_path)
+
+    def test_undo_edit_and_new_day(self):
+        model = self.model
+        today = model.date
+        model.sleep_time = 7.0
+        model.save()
+        model.sleep_time = 8.0
+        model.save()
+        model.go_to_previous_day()
+        model.sleep_time = 6.0
+        model.save()
+        assert len(model._data) == 2
+
+        # the new day disappears again
+        assert model.undo()
+        assert model.date == today - pd.Timedelta(days=1)
+        assert len(model._data) == 1
+        assert model.date not in set(model._data["date"])
+        # the edit goes back to the first value and the view moves to its day
+        assert model.undo()
+        assert model.date == today
+        assert model.sleep_time == 7.0
+        assert model.redo()
+        assert model.sleep_time == 8.0
+        assert model.stats.table("weekday", "sleep_time")["count"].sum() == 1
+        assert len(model.data_at(0)) == 0
+        assert model.data_at(2).loc[0, "sleep_time"] == 8.0
+        pd.testing.assert_frame_equal(model.data_at(model.history.version), model._data)
+
+        model.flush()
+        stored = self.make_model(self.data_path)
+        pd.testing.assert_frame_equal(stored._data, model._data)
+        kinds = [json.loads(line)["kind"] for line in model.history_path.read_text().splitlines()]
+        assert kinds == ["save", "save", "save", "undo", "undo", "redo"]
+
+    def test_save_clears_redo(self):
+        model = self.model
+        model.save()
+        model.undo()
+        assert model.can_redo
+        model.save()
+        assert not model.can_redo
+
+    def test_undo_reset(self):
+        model = self.model
+        model.sleep_time = 5.0
+        model.reset_values()
+        assert model.sleep_time == 0
+        assert model.undo()
+        assert model.sleep_time == 5.0
+        assert not model.undo()
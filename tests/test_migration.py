@@ -0,0 +1,53 @@
+import logging
+import pandas as pd
+import pytest
+from pathlib import Path
+
+from migration import migrate, read_columns, Rename, Drop
+from schema import SCHEMA
+
+LEGACY = Path(__file__).parent.parent / "OLD_comfort_data.csv"
+
+
+class TestMigration:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.logger = logging.getLogger("test")
+        self.target = tmp_path / "migrated.csv"
+
+    def test_unnamed_columns(self):
+        assert read_columns(LEGACY)[-1] == "unnamed_12"
+
+    @pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+    def test_legacy_file(self, chunk_size):
+        rows = migrate(LEGACY, self.target, self.logger, chunk_size=chunk_size)
+        df = pd.read_csv(self.target, parse_dates=["date"])
+        assert rows == len(df) == 9
+        assert list(df.columns) == SCHEMA.names
+        assert df["date"].is_unique
+        # the last of the three rows from 2023-01-19 wins
+        day = df[df["date"] == "2023-01-19"].iloc[0]
+        assert bool(day["code_tasks"]) and bool(day["gym"])
+        # the party days keep their flag as some alcohol
+        partied = (df["date"] == "2023-01-15") | (df["date"] == "2023-01-18")
+        assert (df.loc[partied, "alcohol"] == 1).all()
+        assert (df.loc[~partied, "alcohol"] == -1).all()
+        assert df.loc[df["date"] == "2023-01-16", "fast_food"].item()
+
+    def test_chunking_does_not_change_result(self):
+        migrate(LEGACY, self.target, self.logger, chunk_size=1)
+        expected = self.target.read_bytes()
+        migrate(LEGACY, self.target, self.logger, chunk_size=3)
+        assert self.target.read_bytes() == expected
+
+    def test_custom_steps(self, tmp_path):
+        source = tmp_path / "source.csv"
+        source.write_text("date,sleep,noise\n2023-02-01,7,1\n2023-02-02,8,2\n2023-02-01,6,3\n")
+        migrate(source, self.target, self.logger, steps=(Rename("sleep", "sleep_time"), Drop("noise")))
+        df = pd.read_csv(self.target)
+        assert df["sleep_time"].tolist() == [8.0, 6.0]
+
+    def test_model_loads_migrated_file(self, make_model):
+        migrate(LEGACY, self.target, self.logger)
+        model = make_model(self.target)
+        assert len(model._data) == 9
@@ -1,9 +1,11 @@
 import datetime
 import pytest
+import numpy as np
+import pandas as pd
 
 from pathlib import Path
 
-from tracker_app.model import Model
+from model import Model, FIELDS, DayRecord
 
 
 class TestModel:
@@ -52,3 +54,254 @@ class TestModel:
         model2 = Model(_data_path=self.data_path)
         model2.__change_date(datetime.date(2020, 1, 2))
         assert model2.mc_donalds == 10
+
+
+class TestModelIndex:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.data_path = tmp_path / "comfort_data.csv"
+        self.make_model = make_model
+
+    def model(self) -> Model:
+        return self.make_model(self.data_path)
+
+    def test_new_days_are_merged_sorted(self):
+        model = self.model()
+        model.save()
+        model.go_to_previous_day()
+        model.save()
+        # the new day waits next to the stored ones until the data is read
+        assert len(model._new_days) == 2
+        assert model._data["date"].is_monotonic_increasing
+        assert len(model._data) == 2 and model._new_days == {}
+
+    def test_new_day_does_not_move_rows(self):
+        model = self.model()
+        model.save()
+        data = model._data
+        model.go_to_previous_day()
+        model.sleep_time = 5.0
+        model.save()
+        # navigation and edits of the new day do not need the merge
+        model.go_to_next_day()
+        model.go_to_previous_day()
+        assert model.sleep_time == 5.0
+        model.sleep_time = 6.0
+        model.save()
+        assert model._frame is data and len(model._new_days) == 1
+        assert model._data.iloc[0]["sleep_time"] == 6.0
+
+    def test_update_existing_day_in_place(self):
+        model = self.model()
+        model.save()
+        data = model._data
+        model.sleep_time = 7.5
+        model.save()
+        assert model._data is data
+        assert model._data.shape[0] == 1
+        assert model._data.iloc[0]["sleep_time"] == 7.5
+        assert model._data["sleep_time"].dtype == np.float16
+
+    def test_navigation_uses_index(self):
+        model = self.model()
+        model.sleep_time = 6.0
+        model.go_to_previous_day()
+        model.sleep_time = 5.0
+        model.save()
+        model.go_to_next_day()
+        assert model.sleep_time == 0
+        model.go_to_previous_day()
+        assert model.sleep_time == 5.0
+
+    def test_upsert_matches_full_rebuild(self):
+        """Incremental upserts give the same frame as the original concat, cast and sort."""
+        model = self.model()
+        expected = model._data.copy()
+        rng = np.random.default_rng(0)
+        today = model.date
+        for offset in rng.integers(-30, 30, size=40):
+            model._Model__change_date(today + datetime.timedelta(days=int(offset)))
+            model.sleep_time = np.float16(rng.integers(0, 12))
+            model.gym = np.bool_(rng.integers(0, 2))
+            model.alcohol = np.int8(rng.integers(-1, 3))
+            model.update()
+
+            expected = expected[expected["date"] != model.date]
+            expected = pd.concat(
+                [expected, pd.DataFrame(model.fields, index=[0])], ignore_index=True
+            )
+            for field, (field_type, _) in FIELDS.items():
+                expected[field] = expected[field].astype(field_type)
+            expected["date"] = pd.to_datetime(expected["date"])
+            expected = expected.sort_values(by="date")
+
+            pd.testing.assert_frame_equal(
+                model._data, expected.reset_index(drop=True)
+            )
+
+    def test_dates_are_datetime64(self):
+        model = self.model()
+        model.save()
+        model.go_to_previous_day()
+        model.save()
+        assert model._data["date"].dtype == "datetime64[ns]"
+        assert isinstance(model.date, datetime.date)
+        model.flush()
+        model2 = self.model()
+        assert model2._data["date"].dtype == "datetime64[ns]"
+        assert model2._data["date"].is_monotonic_increasing
+        assert model2.date in set(model2._data["date"])
+
+    def test_update_refreshes_cache_and_version(self):
+        model = self.model()
+        model._days.wait(5)
+        model.sleep_time = 7
+        model.update()
+        assert model.version == 1
+        model.go_to_next_day()
+        model.go_to_previous_day()
+        assert model.sleep_time == 7
+
+    def test_save_bumps_version(self):
+        model = self.model()
+        assert model.version == 0
+        model.save()
+        model.save()
+        assert model.version == 2
+        assert "version" not in model.fields
+
+
+class TestModelRolling:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        self.model = model
+        rng = np.random.default_rng(3)
+        today = self.model.date
+        # days with gaps, so calendar windows differ from row windows
+        for offset in sorted(set(rng.integers(0, 120, size=70)), reverse=True):
+            self.model._Model__change_date(today - pd.Timedelta(days=int(offset)))
+            self.model.sleep_time = rng.integers(3, 10)
+            self.model.save()
+        self.series = self.model._data.set_index("date")["sleep_time"].astype(float)
+
+    def test_column_is_a_view(self):
+        values = self.model.column("sleep_time")
+        assert np.shares_memory(values, self.model._data["sleep_time"].to_numpy())
+        assert not values.flags.writeable
+        start = self.model.date - pd.Timedelta(days=10)
+        assert list(self.model.column("sleep_time", start)) == list(self.series[start:])
+
+    @pytest.mark.parametrize("window", [1, 7, 30, 90])
+    @pytest.mark.parametrize("agg", Model.AGGREGATIONS)
+    def test_matches_pandas_rolling(self, window, agg):
+        dates, values = self.model.rolling("sleep_time", window, agg)
+        expected = getattr(self.series.rolling(f"{window}D"), agg)()
+        assert (dates == self.series.index.to_numpy()).all()
+        np.testing.assert_allclose(values, expected.to_numpy(), equal_nan=True, atol=1e-9)
+
+    def test_bounds_keep_full_windows(self):
+        start = self.model.date - pd.Timedelta(days=20)
+        dates, values = self.model.rolling("sleep_time", 30, start=start)
+        _, full = self.model.rolling("sleep_time", 30)
+        assert dates[0] >= start
+        np.testing.assert_allclose(values, full[-len(values):])
+
+    def test_unknown_aggregation(self):
+        with pytest.raises(ValueError):
+            self.model.rolling("sleep_time", 7, "median")
+
+
+class TestModelUpsertMany:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.data_path = tmp_path / "comfort_data.csv"
+        self.make_model = make_model
+
+    def model(self, name: str = "comfort_data.csv") -> Model:
+        return self.make_model(self.data_path.with_name(name))
+
+    def week(self, start: pd.Timestamp) -> list:
+        return [
+            {"date": start + pd.Timedelta(days=i), "sleep_time": 5 + i, "gym": i % 2 == 0}
+            for i in range(7)
+        ]
+
+    def test_matches_single_saves(self):
+        batched, single = self.model("batched.csv"), self.model("single.csv")
+        today = batched.date
+        start = today - pd.Timedelta(days=3)
+        for model in (batched, single):
+            # one stored day inside the week, one after it
+            model.sleep_time = 9
+            model.save()
+            model._Model__change_date(start + pd.Timedelta(days=10))
+            model.save()
+            model._Model__change_date(today)
+        batched.upsert_many(self.week(start))
+        for values in self.week(start):
+            single._Model__change_date(values["date"])
+            single.set_default_values()
+            single.set_values(values)
+            single.save()
+        pd.testing.assert_frame_equal(batched._data, single._data)
+        pd.testing.assert_frame_equal(
+            batched.stats.table("weekday", "sleep_time"), single.stats.table("weekday", "sleep_time")
+        )
+        assert batched.habits.longest("gym") == single.habits.longest("gym")
+        # the current day follows the batch
+        assert batched.sleep_time == 8
+
+    def test_single_write_and_undo(self, monkeypatch):
+        model = self.model()
+        writes = []
+        save_many = model._storage.save_many
+        monkeypatch.setattr(
+            model._storage, "save_many", lambda snapshot, records: writes.append(len(records)) or save_many(snapshot, records)
+        )
+        model.upsert_many(self.week(model.date - pd.Timedelta(days=6)))
+        model.flush()
+        assert writes == [7]
+        assert model.undo()
+        assert model._data.empty
+        model.flush()
+        assert self.model()._data.empty
+
+    def test_invalid_batch_is_rejected(self):
+        model = self.model()
+        week = self.week(model.date)
+        week[3]["work_time"] = 20
+        with pytest.raises(ValueError, match=str(week[3]["date"].date())):
+            model.upsert_many(week)
+        assert model._data.empty
+
+
+class TestDayRecord:
+    def test_defaults_and_order(self):
+        record = DayRecord(date="2023-01-21")
+        assert list(record.as_dict()) == [f for f in FIELDS if f != "date"] + ["date"]
+        assert record.date == pd.Timestamp("2023-01-21")
+        assert record.alcohol == -1 and isinstance(record.alcohol, np.int8)
+        assert not hasattr(record, "__dict__")
+
+    def test_values_are_cast(self):
+        record = DayRecord(sleep_time="7.5", overall_score=4.0, gym=1)
+        assert isinstance(record.sleep_time, np.float16) and record.sleep_time == 7.5
+        assert isinstance(record.overall_score, np.int8)
+        assert record["gym"] is np.True_
+        with pytest.raises(ValueError):
+            record.work_time = "not a number"
+
+    def test_copy_is_independent(self):
+        record = DayRecord(sleep_time=8)
+        copy = record.copy()
+        assert copy == record
+        copy.sleep_time = 6
+        assert record.sleep_time == 8
+
+    def test_model_fields_go_through_record(self, model):
+        model.overall_score = 3.0
+        assert model._record.overall_score == 3
+        assert isinstance(model.overall_score, np.int8)
+        assert model.fields == model._record.as_dict()
+        model.set_values({"sleep_time": "", "work_time": "4"})
+        assert model.sleep_time == 0 and model.work_time == 4
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import FIELDS
+from predictor import ScorePredictor
+
+FEATURES = [field for field in FIELDS if field not in ("date", "overall_score")]
+
+
+class TestScorePredictor:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.data_path = tmp_path / "data.csv"
+        self.make_model = make_model
+        self.model = make_model(self.data_path)
+        rng = np.random.default_rng(11)
+        today = self.model.date
+        for offset in rng.integers(0, 50, size=80):
+            self.model._Model__change_date(today - pd.Timedelta(days=int(offset)))
+            self.model.sleep_time = rng.integers(4, 10)
+            self.model.gym = bool(rng.integers(0, 2))
+            score = 0.5 * int(self.model.sleep_time) - 1 + 1.5 * self.model.gym
+            self.model.overall_score = int(np.clip(round(score), 0, 5))
+            self.model.save()
+
+    def test_online_matches_batch_fit(self):
+        batch = ScorePredictor.from_frame(self.model._data, FEATURES)
+        online = self.model._predictor
+        np.testing.assert_allclose(online.weights, batch.weights, atol=1e-6)
+        np.testing.assert_allclose(online.covariance, batch.covariance, atol=1e-6)
+        assert online.matches(self.model._data)
+
+    def test_prediction_and_drivers(self):
+        low = self.model.predict_score({"sleep_time": 4, "gym": False})
+        high = self.model.predict_score({"sleep_time": 9, "gym": True})
+        assert high - low > 2
+        assert set(self.model.score_drivers().index[:2]) == {"sleep_time", "gym"}
+        # unsaved form values do not change the model
+        assert self.model.predict_score({"sleep_time": "", "gym": None}) == self.model.predict_score()
+
+    def test_state_is_persisted(self, monkeypatch):
+        self.model.flush()
+        assert self.model.predictor_path.exists()
+
+        def from_frame(*args, **kwargs):
+            raise AssertionError("predictor should not be retrained")
+
+        monkeypatch.setattr(ScorePredictor, "from_frame", from_frame)
+        model = self.make_model(self.data_path)
+        np.testing.assert_allclose(model._predictor.weights, self.model._predictor.weights)
+
+    def test_stale_state_is_retrained(self):
+        self.model.flush()
+        # the data file was edited by hand after the last save
+        df = self.model._data.copy()
+        df.loc[0, "sleep_time"] += 1
+        df.to_csv(self.data_path, index=False)
+        self.model._storage.journal_path.unlink()
+        model = self.make_model(self.data_path)
+        assert model._predictor.matches(model._data)
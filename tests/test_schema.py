@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from schema import SCHEMA, Schema, SCHEMA_PATH
+from model import FIELDS
+
+
+class TestSchema:
+    def test_fields_match_registry(self):
+        schema = Schema.from_yaml(SCHEMA_PATH)
+        assert schema.names == list(FIELDS)
+        assert schema.names[-1] == "date"
+        assert schema["gym"].widget == "tile"
+        assert schema["overall_score"].max == 5
+
+    def test_dtype(self):
+        assert SCHEMA.dtype.names == tuple(SCHEMA.names)
+        assert SCHEMA.dtype["sleep_time"] == np.float16
+        assert SCHEMA.dtype["date"] == np.dtype("datetime64[ns]")
+
+    def test_cast_matches_per_column_astype(self):
+        df = pd.DataFrame(
+            [{name: field.default for name, field in zip(SCHEMA.names, SCHEMA)}] * 3
+        )
+        df["sleep_time"] = ["7.5", 8, 6.25]
+        df["date"] = ["2023-01-01", "2023-01-02", "2023-01-03"]
+        cast = SCHEMA.cast(df)
+        expected = df.copy()
+        for field in SCHEMA:
+            expected[field.name] = expected[field.name].astype(field.type)
+        pd.testing.assert_frame_equal(cast, expected)
+
+    def test_invalid_value_names_field(self):
+        df = pd.DataFrame([{field.name: field.default for field in SCHEMA}])
+        df["work_time"] = "a lot"
+        with pytest.raises(ValueError, match="work_time"):
+            SCHEMA.cast(df)
+
+    def test_missing_integer_rejected(self):
+        df = pd.DataFrame([{field.name: field.default for field in SCHEMA}] * 2)
+        df["overall_score"] = [1, None]
+        with pytest.raises(ValueError, match="overall_score"):
+            SCHEMA.cast(df)
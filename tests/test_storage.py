@@ -0,0 +1,410 @@
+import gzip
+import json
+import time
+import logging
+import sqlite3
+import pytest
+import pandas as pd
+
+from model import Model
+from storage import CsvStorage, JournalStorage, SqliteStorage, PartitionedStorage
+
+
+class TestJournalStorage:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.make_model = make_model
+        self.data_path = tmp_path / "comfort_data.csv"
+        self.logger = logging.getLogger("test")
+
+    def model(self, **kwargs) -> Model:
+        return self.make_model(self.data_path, **kwargs)
+
+    def test_save_appends_to_journal(self):
+        model = self.model()
+        base = self.data_path.read_text()
+        model.save()
+        model.flush()
+        model.sleep_time = 7.5
+        model.save()
+        model.flush()
+        assert self.data_path.read_text() == base
+        assert len(model._storage.journal_path.read_text().splitlines()) == 3
+
+    def test_append_does_not_copy_history(self, monkeypatch):
+        model = self.model()
+        snapshots = []
+        monkeypatch.setattr(model, "_Model__snapshot", lambda: snapshots.append(1))
+        model.save()
+        model.flush()
+        assert snapshots == []
+        assert len(self.model()._data) == 1
+
+    def test_replay_last_write_wins(self):
+        model = self.model()
+        model.sleep_time = 6.0
+        model.save()
+        model.go_to_previous_day()
+        model.save()
+        model.go_to_next_day()
+        model.sleep_time = 8.0
+        model.save()
+        model.flush()
+        model2 = self.model()
+        assert model2._data.shape[0] == 2
+        assert model2.sleep_time == 8.0
+        assert list(model2._data["date"]) == sorted(model2._data["date"])
+
+    def test_compaction(self):
+        storage = JournalStorage(self.data_path, self.logger, compact_threshold=1)
+        model = self.model(_storage=storage)
+        for _ in range(3):
+            model.save()
+            model.go_to_next_day()
+        model.flush()
+        storage.close()
+        assert not storage.journal_path.exists()
+        assert not storage.compacting_path.exists()
+        assert pd.read_csv(self.data_path).shape[0] == 3
+        assert self.model()._data.shape[0] == 3
+
+    def test_replay_interrupted_compaction(self):
+        model = self.model()
+        model.save()
+        model.flush()
+        # simulate a crash after the journal was frozen, but before the base was rewritten
+        model._storage.journal_path.rename(model._storage.compacting_path)
+        model.go_to_previous_day()
+        model.save()
+        model.flush()
+        assert self.model()._data.shape[0] == 2
+
+    def test_torn_line_is_skipped(self):
+        model = self.model()
+        model.save()
+        model.flush()
+        # a crash in the middle of an append
+        with open(model._storage.journal_path, "a") as file:
+            file.write("1.0,2.0,0.0,Tr")
+        model2 = self.model()
+        assert len(model2._data) == 1
+        assert not model2._data["date"].isna().any()
+        model2.go_to_previous_day()
+        model2.save()
+        model2.flush()
+        assert len(self.model()._data) == 2
+        assert model2._storage.journal_path.read_text().endswith("\n")
+
+    def test_compaction_keeps_stale_frozen_journal(self):
+        model = self.model()
+        model.save()
+        model.flush()
+        # a crash after the journal was frozen, before the base was rewritten
+        model._storage.journal_path.rename(model._storage.compacting_path)
+        model2 = self.model()
+        model2.go_to_previous_day()
+        model2.save()
+        model2.flush()
+        frozen = model2._storage.compacting_path.read_text()
+        storage = model2._storage
+        merged = []
+        # keep the frozen journal around to look at it
+        storage._JournalStorage__compact = lambda data: merged.append(storage.compacting_path.read_text())
+        storage.compact(model2._data)
+        storage.close()
+        # the frozen journal got the new records, none were overwritten
+        lines = merged[0].splitlines()
+        assert lines[: len(frozen.splitlines())] == frozen.splitlines()
+        assert len(lines) == 3
+        assert not storage.journal_path.exists()
+        assert len(self.model()._data) == 2
+
+    def test_csv_storage_rewrites_file(self):
+        model = self.model(_storage=CsvStorage(self.data_path, self.logger))
+        model.save()
+        model.flush()
+        assert pd.read_csv(self.data_path).shape[0] == 1
+        assert model.date == pd.Timestamp.today().normalize()
+
+
+class TestSnapshot:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.make_model = make_model
+        self.data_path = tmp_path / "comfort_data.csv"
+        self.logger = logging.getLogger("test")
+        model = make_model(self.data_path)
+        for hours in range(3):
+            model.sleep_time = hours
+            model.save()
+            model.go_to_previous_day()
+        self.expected = model._data
+        model.flush()
+        model._storage.compact(model._data)
+        model._storage.close()
+
+    def test_snapshot_is_used(self, monkeypatch):
+        storage = CsvStorage(self.data_path, self.logger)
+        assert storage.snapshot_path.exists()
+
+        def read_csv(*args, **kwargs):
+            raise AssertionError("csv should not be parsed")
+
+        monkeypatch.setattr(pd, "read_csv", read_csv)
+        model = self.make_model(self.data_path, _storage=storage)
+        pd.testing.assert_frame_equal(model._data, self.expected)
+
+    def test_stale_snapshot_falls_back_to_csv(self):
+        storage = CsvStorage(self.data_path, self.logger)
+        lines = self.data_path.read_text().splitlines()
+        self.data_path.write_text("\n".join(lines[:-1]) + "\n")
+        assert storage.load([]).shape[0] == 2
+        # the snapshot was refreshed and matches the edited file
+        self.data_path.write_text("\n".join(lines) + "\n")
+        assert storage.load([]).shape[0] == 3
+
+    def test_broken_snapshot_is_ignored(self):
+        storage = CsvStorage(self.data_path, self.logger)
+        storage.snapshot_path.write_bytes(b"not a snapshot")
+        assert storage.load([]).shape[0] == 3
+
+
+class TestSqliteStorage:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.make_model = make_model
+        self.data_path = tmp_path / "comfort_data.db"
+        self.logger = logging.getLogger("test")
+
+    def model(self, **kwargs) -> Model:
+        return self.make_model(self.data_path, **kwargs)
+
+    def test_picked_by_suffix(self):
+        model = self.model()
+        assert isinstance(model._storage, SqliteStorage)
+        mode = model._storage._connection.execute("PRAGMA journal_mode").fetchone()
+        assert mode == ("wal",)
+
+    def test_upsert_and_reload(self):
+        model = self.model()
+        model.sleep_time = 6.0
+        model.save()
+        model.sleep_time = 7.5
+        model.gym = True
+        model.save()
+        model.go_to_previous_day()
+        model.save()
+        model.flush()
+        model2 = self.model()
+        assert model2._data.shape[0] == 2
+        assert model2.sleep_time == 7.5
+        assert model2.gym
+        pd.testing.assert_frame_equal(model2._data, model._data)
+
+    def test_range_is_pushed_down(self):
+        model = self.model()
+        for hours in range(5, 0, -1):
+            model.sleep_time = hours
+            model.save()
+            model.go_to_previous_day()
+        model.flush()
+        today = pd.Timestamp.today().normalize()
+        df = model._storage.read_range(today - pd.Timedelta(days=2), today, fields=["sleep_time"])
+        assert list(df.columns) == ["date", "sleep_time"]
+        assert list(df["sleep_time"]) == [3.0, 4.0, 5.0]
+
+    def test_imports_csv_once(self):
+        csv_model = self.make_model(self.data_path.with_suffix(".csv"))
+        csv_model.sleep_time = 8.0
+        csv_model.save()
+        csv_model.go_to_previous_day()
+        csv_model.save()
+        csv_model.flush()
+        model = self.model()
+        pd.testing.assert_frame_equal(model._data, csv_model._data)
+        model._storage.close()
+        assert self.model()._data.shape[0] == 2
+
+
+def test_range_does_not_wait_for_the_writer(tmp_path, make_model, monkeypatch):
+    model = make_model(tmp_path / "data.db", _save_delay=0.01)
+
+    def locked(snapshot, records):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(model._storage, "save_many", locked)
+    model.sleep_time = 7
+    model.save()
+    start = time.monotonic()
+    df = model.range(fields=["sleep_time"])
+    assert time.monotonic() - start < 0.1
+    assert list(df["sleep_time"]) == [7]
+    assert not model.saved
+
+
+def test_csv_range_matches_sqlite(tmp_path, make_model):
+    models = [make_model(tmp_path / "data.csv"), make_model(tmp_path / "data.db")]
+    for model in models:
+        for hours in range(4):
+            model.work_time = hours
+            model.save()
+            model.go_to_previous_day()
+    models[1].flush()
+    start = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    csv_range = models[0].range(start, fields=["work_time"]).reset_index(drop=True)
+    sqlite_range = models[1]._storage.read_range(start, fields=["work_time"])
+    pd.testing.assert_frame_equal(csv_range, sqlite_range, check_dtype=False)
+
+
+class TestPartitionedStorage:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.make_model = make_model
+        self.data_path = tmp_path / "comfort_data.parts"
+        self.logger = logging.getLogger("test")
+
+    def model(self, **kwargs) -> Model:
+        return self.make_model(self.data_path, **kwargs)
+
+    def fill(self, model: Model, days: int) -> None:
+        for hours in range(days):
+            model.sleep_time = hours % 10
+            model.save()
+            model.go_to_previous_day()
+        model.flush()
+
+    def test_picked_by_suffix(self):
+        assert isinstance(self.model()._storage, PartitionedStorage)
+
+    def test_one_file_per_month(self):
+        model = self.model()
+        self.fill(model, 70)
+        storage = model._storage
+        current = pd.Timestamp.today().strftime("%Y-%m")
+        assert storage.partitions[current]["file"] == f"{current}.csv"
+        closed = [entry for month, entry in storage.partitions.items() if month != current]
+        assert closed and all(entry["file"].endswith(".csv.gz") for entry in closed)
+        assert sum(entry["rows"] for entry in storage.partitions.values()) == 70
+        files = {path.name for path in self.data_path.iterdir()}
+        assert files == {storage.MANIFEST, *(e["file"] for e in storage.partitions.values())}
+        reloaded = self.model()
+        pd.testing.assert_frame_equal(reloaded._data, model._data)
+
+    def test_save_rewrites_only_its_partition(self):
+        model = self.model()
+        self.fill(model, 70)
+        model._Model__change_date(pd.Timestamp.today())
+        stamps = {p.name: p.stat().st_mtime_ns for p in self.data_path.glob("*.csv*")}
+        model.sleep_time = 3
+        model.save()
+        model.flush()
+        changed = [p.name for p in self.data_path.glob("*.csv*") if p.stat().st_mtime_ns != stamps[p.name]]
+        assert changed == [model._storage.partitions[model.date.strftime("%Y-%m")]["file"]]
+
+    def test_range_reads_only_needed_partitions(self, monkeypatch):
+        model = self.model()
+        self.fill(model, 70)
+        read = []
+        original = pd.read_csv
+
+        def read_csv(path, *args, **kwargs):
+            read.append(path.name)
+            return original(path, *args, **kwargs)
+
+        monkeypatch.setattr(pd, "read_csv", read_csv)
+        today = pd.Timestamp.today().normalize()
+        df = model._storage.read_range(today - pd.Timedelta(days=2), today, ["sleep_time"])
+        assert len(df) == 3
+        assert len(read) <= 2
+        expected = model._data.iloc[-3:][["date", "sleep_time"]].reset_index(drop=True)
+        pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    def test_imports_csv_once(self, tmp_path, monkeypatch):
+        csv_model = self.make_model(tmp_path / "comfort_data.csv")
+        self.fill(csv_model, 5)
+        imported = []
+        original = PartitionedStorage.import_csv
+
+        def import_csv(storage, csv_path):
+            imported.append(csv_path)
+            return original(storage, csv_path)
+
+        monkeypatch.setattr(PartitionedStorage, "import_csv", import_csv)
+        assert len(self.model()._data) == 5
+        # days saved to the csv later are not imported again
+        self.fill(csv_model, 7)
+        assert len(self.model()._data) == 5
+        assert imported == [tmp_path / "comfort_data.csv"]
+
+    def test_months_are_compressed_on_close(self):
+        model = self.model()
+        self.fill(model, 40)
+        month = min(model._storage.partitions)
+        # a month written before it closed is still plain csv
+        self.data_path.joinpath(f"{month}.csv").write_bytes(
+            gzip.decompress(self.data_path.joinpath(f"{month}.csv.gz").read_bytes())
+        )
+        self.data_path.joinpath(f"{month}.csv.gz").unlink()
+        manifest_path = model._storage.manifest_path
+        manifest = json.loads(manifest_path.read_text())
+        manifest["partitions"][month]["file"] = f"{month}.csv"
+        manifest_path.write_text(json.dumps(manifest))
+        reloaded = self.model()
+        assert reloaded._storage.partitions[month]["file"] == f"{month}.csv"
+        reloaded.close()
+        assert reloaded._storage.partitions[month]["file"] == f"{month}.csv.gz"
+        assert not self.data_path.joinpath(f"{month}.csv").exists()
+        pd.testing.assert_frame_equal(self.model().range(), model.range())
+
+    def test_opening_reads_only_the_current_month(self, monkeypatch):
+        model = self.model()
+        self.fill(model, 70)
+        model.close(timeout=5)
+        read = []
+        original = pd.read_csv
+
+        def read_csv(path, *args, **kwargs):
+            read.append(path.name)
+            return original(path, *args, **kwargs)
+
+        monkeypatch.setattr(pd, "read_csv", read_csv)
+        reloaded = self.model()
+        reloaded._days.wait(5)
+        today = pd.Timestamp.today().normalize()
+        # the saved statistics are checked against the manifest, not the closed months,
+        # only the month before is read if the navigation window reaches into it
+        months = {today.strftime("%Y-%m"), (today - pd.Timedelta(days=reloaded._days.radius)).strftime("%Y-%m")}
+        assert sorted(read) == sorted(reloaded._storage.partitions[month]["file"] for month in months)
+        assert not reloaded._trackers_changed
+        assert reloaded._data["date"].min() >= pd.Timestamp(f"{min(months)}-01")
+        # older months are read once something needs them
+        reloaded._Model__change_date(today - pd.Timedelta(days=65))
+        assert reloaded.sleep_time == 5
+        pd.testing.assert_frame_equal(reloaded.range(), model.range())
+        assert reloaded.stats.table("month", "sleep_time").equals(model.stats.table("month", "sleep_time"))
+
+    def test_edited_manifest_rebuilds_trackers(self):
+        model = self.model()
+        self.fill(model, 40)
+        model.close(timeout=5)
+        manifest = json.loads(model._storage.manifest_path.read_text())
+        for entry in manifest["partitions"].values():
+            del entry["checksum"]
+        model._storage.manifest_path.write_text(json.dumps(manifest))
+        reloaded = self.model()
+        assert reloaded._trackers_changed
+        assert len(reloaded._data) == 40
+
+
+@pytest.mark.parametrize("name", ["data.csv", "data.db", "data.parts"])
+def test_undo_removes_new_day(tmp_path, make_model, name):
+    model = make_model(tmp_path / name)
+    model.save()
+    model.go_to_previous_day()
+    model.save()
+    model.flush()
+    model.undo()
+    model.flush()
+    stored = make_model(tmp_path / name)._data
+    assert len(stored) == 1
+    pd.testing.assert_frame_equal(stored, model._data)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import Aggregates
+from correlations import Correlations
+from habits import Habits
+
+
+class TestTrackerState:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, make_model):
+        self.data_path = tmp_path / "data.csv"
+        self.make_model = make_model
+        self.model = make_model(self.data_path)
+        rng = np.random.default_rng(5)
+        today = self.model.date
+        for offset in rng.integers(0, 40, size=60):
+            self.model._Model__change_date(today - pd.Timedelta(days=int(offset)))
+            self.model.sleep_time = rng.integers(4, 10)
+            self.model.gym = bool(rng.integers(0, 2))
+            self.model.save()
+
+    def reopen(self):
+        self.model.close(timeout=5)
+        return self.make_model(self.data_path)
+
+    def test_trackers_are_restored(self, monkeypatch):
+        self.model.close(timeout=5)
+        assert self.model.tracker_state_path.exists()
+
+        def from_frame(*args, **kwargs):
+            raise AssertionError("trackers should not be rebuilt")
+
+        for tracker in (Aggregates, Habits, Correlations):
+            monkeypatch.setattr(tracker, "from_frame", from_frame)
+        model = self.make_model(self.data_path)
+        assert not model._trackers_changed
+        pd.testing.assert_frame_equal(
+            model.stats.table("weekday", "sleep_time"), self.model.stats.table("weekday", "sleep_time")
+        )
+        assert model.habits.longest("gym") == self.model.habits.longest("gym")
+        pd.testing.assert_frame_equal(model.correlations.pearson(1), self.model.correlations.pearson(1))
+
+    def test_restored_trackers_keep_tracking(self):
+        model = self.reopen()
+        model.sleep_time = 3.0
+        model.save()
+        rebuilt = Aggregates.from_frame(model._data, model.stats.fields)
+        pd.testing.assert_frame_equal(
+            model.stats.table("month", "sleep_time"), rebuilt.table("month", "sleep_time")
+        )
+        assert model.habits.longest("gym") == Habits.from_frame(model._data).longest("gym")
+
+    def test_stale_state_is_rebuilt(self):
+        self.model.close(timeout=5)
+        # the data file was edited by hand after the last close
+        df = self.model._data.copy()
+        df.loc[0, "sleep_time"] += 1
+        df.to_csv(self.data_path, index=False)
+        self.model._storage.journal_path.unlink(missing_ok=True)
+        model = self.make_model(self.data_path)
+        assert model._trackers_changed
+        rebuilt = Aggregates.from_frame(model._data, model.stats.fields)
+        pd.testing.assert_frame_equal(
+            model.stats.table("weekday", "sleep_time"), rebuilt.table("weekday", "sleep_time")
+        )
+
+    def test_broken_state_is_rebuilt(self):
+        self.model.close(timeout=5)
+        self.model.tracker_state_path.write_bytes(b"not a pickle")
+        model = self.make_model(self.data_path)
+        assert model._trackers_changed
+        assert model.habits.longest("gym") == self.model.habits.longest("gym")
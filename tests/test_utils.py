@@ -0,0 +1,24 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from utils import StartupTimer
+
+
+def test_startup_report():
+    timer = StartupTimer(enabled=True, heavy_modules=("sys", "not_a_module"))
+    timer.mark("imports")
+    timer.mark("model")
+    report = timer.report().splitlines()
+    assert [line.split(":")[0].strip() for line in report[:2]] == ["imports", "model"]
+    assert report[2].endswith("loaded: True")
+    assert report[3].endswith("loaded: False")
+
+
+def test_model_does_not_import_plotting_stack():
+    code = (
+        "import sys, model, controller; "
+        "assert not {'matplotlib', 'seaborn'} & set(sys.modules), sys.modules.keys()"
+    )
+    app_dir = Path(__file__).parent.parent / "tracker_app"
+    subprocess.run([sys.executable, "-c", code], cwd=app_dir, check=True)
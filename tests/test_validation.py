@@ -0,0 +1,86 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+
+from schema import SCHEMA
+from validation import Validator, RangeRule, SumRule, ValidationError
+
+
+def frame(**columns) -> pd.DataFrame:
+    rows = len(next(iter(columns.values())))
+    df = pd.DataFrame({field.name: [field.default] * rows for field in SCHEMA})
+    for name, values in columns.items():
+        df[name] = values
+    return SCHEMA.cast(df)
+
+
+class TestValidator:
+    def test_rules_from_schema(self):
+        validator = Validator.from_schema(SCHEMA)
+        names = [rule.name for rule in validator.rules]
+        assert "sleep_time_range" in names
+        assert "alcohol_range" in names
+        assert "hours_per_day" in names
+
+    def test_valid_rows_pass(self):
+        df = frame(sleep_time=[8, 7.5], work_time=[8, 0], alcohol=[-1, 2])
+        assert Validator.from_schema(SCHEMA).check(df)
+
+    def test_reports_every_offending_row(self):
+        df = frame(
+            sleep_time=[8, 25, 10, 7],
+            work_time=[8, 0, 10, 0],
+            study_time=[0, 0, 10, 0],
+            alcohol=[0, 1, 2, 3],
+        )
+        report = Validator.from_schema(SCHEMA).check(df)
+        assert not report
+        assert report.rows == [1, 2, 3]
+        by_name = {rule.name: rows for rule, rows in report.violations.items()}
+        assert by_name["sleep_time_range"] == [1]
+        assert by_name["hours_per_day"] == [1, 2]
+        assert by_name["alcohol_range"] == [3]
+        assert "alcohol" in report.fields
+
+    def test_masks(self):
+        df = pd.DataFrame({"a": [0.0, np.nan, 5.0], "b": [1.0, 1.0, 1.0]})
+        assert RangeRule("a", 0, 4).mask(df).tolist() == [False, True, True]
+        assert SumRule("ab", ("a", "b"), 2).mask(df).tolist() == [False, False, True]
+
+
+class TestModelValidation:
+    @pytest.fixture(autouse=True)
+    def setup(self, model):
+        self.model = model
+
+    def test_save_rejects_broken_day(self):
+        self.model.sleep_time = 20
+        self.model.work_time = 10
+        with pytest.raises(ValueError, match="hours_per_day"):
+            self.model.save()
+        assert len(self.model._data) == 0
+        assert self.model.version == 0
+
+    def test_rejected_values_are_not_kept(self):
+        self.model.sleep_time = 6
+        with pytest.raises(ValidationError) as info:
+            self.model.save_values({"sleep_time": 20, "work_time": 10})
+        assert set(info.value.report.fields) == {"sleep_time", "work_time", "study_time"}
+        assert info.value.messages("work_time") == ["work_time + study_time + sleep_time has to be at most 24"]
+        assert info.value.messages("gym") == []
+        assert self.model.sleep_time == 6 and self.model.work_time == 0
+        self.model.save_values({"sleep_time": 7})
+        assert self.model._data["sleep_time"].tolist() == [7]
+
+    def test_load_keeps_invalid_rows(self, tmp_path, caplog, make_model):
+        self.model.sleep_time = 8
+        self.model.save()
+        path = tmp_path / "old.csv"
+        df = self.model._data.copy()
+        df["sleep_time"] = 30
+        df.to_csv(path, index=False)
+        with caplog.at_level(logging.WARNING):
+            model = make_model(path)
+        assert len(model._data) == 1
+        assert "sleep_time_range" in caplog.text
@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+import pytest
+
+from writer import BackgroundWriter
+
+
+class TestBackgroundWriter:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.batches = []
+        self.writer = BackgroundWriter(self.batches.append, logging.getLogger("test"), delay=0.2)
+        yield
+        self.writer.close(5)
+
+    def test_saves_of_a_day_are_merged(self):
+        for value in range(5):
+            self.writer.submit("2023-01-01", value)
+        self.writer.submit("2023-01-02", "other")
+        assert not self.writer.idle
+        assert self.writer.flush(5)
+        assert self.batches == [[4, "other"]]
+        assert self.writer.idle
+
+    def test_debounce(self):
+        self.writer.submit("a", 1)
+        time.sleep(0.05)
+        assert self.batches == []
+        deadline = time.monotonic() + 5
+        while not self.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert self.batches == [[1]]
+
+    def test_listener_called_after_write(self):
+        written = threading.Event()
+        self.writer.add_listener(written.set)
+        self.writer.submit("a", 1)
+        assert written.wait(5)
+        assert self.writer.idle
+
+    def test_failed_batch_is_retried(self):
+        failures = [RuntimeError("disk full")]
+        batches = []
+
+        def write(records):
+            if failures:
+                raise failures.pop()
+            batches.append(records)
+
+        writer = BackgroundWriter(write, logging.getLogger("test"), delay=0.05)
+        writer.submit("a", 1)
+        writer.flush(0.02)
+        writer.submit("a", 2)
+        assert writer.close(5)
+        assert batches == [[2]]
+
+    def test_gives_up_after_retries(self):
+        batches = []
+        broken = [True]
+
+        def write(records):
+            if broken[0]:
+                raise RuntimeError("database is locked")
+            batches.append(records)
+
+        writer = BackgroundWriter(write, logging.getLogger("test"), delay=0.01, retries=3)
+        writer.submit("a", 1)
+        assert not writer.flush(5)
+        assert writer.failed == {"a": 1}
+        broken[0] = False
+        # the records given up on go out with the next save
+        writer.submit("b", 2)
+        assert writer.close(5)
+        assert batches == [[1, 2]]
+        assert writer.failed == {}
+
+    def test_close_writes_pending(self):
+        self.writer.submit("a", 1)
+        self.writer.close(5)
+        assert self.batches == [[1]]
+        with pytest.raises(RuntimeError):
+            self.writer.submit("b", 2)
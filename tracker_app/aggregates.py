@@ -0,0 +1,96 @@
+import calendar
+import numpy as np
+import pandas as pd
+
+
+class Aggregates:
+    """
+    Running count, sum and sum of squares of every field, grouped by weekday,
+    by `overall_score` and by month. Built once from the loaded data, then kept up to date
+    by `add` and `remove` for every saved day, so statistics never rescan the history.
+    Months are keyed by their number since 1970-01 (`datetime64[M]`), tables show them as `2023-01`.
+
+    Args:
+        `fields`: Numeric (or boolean) fields to aggregate.
+    """
+
+    GROUPS = ("weekday", "overall_score", "month")
+
+    def __init__(self, fields: list) -> None:
+        self.fields = list(fields)
+        self._positions = {field: i for i, field in enumerate(self.fields)}
+        # group -> key -> [count, sums, squares]
+        self._tables = {group: {} for group in self.GROUPS}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fields: list) -> "Aggregates":
+        aggregates = cls(fields)
+        values = df[aggregates.fields].to_numpy(dtype=float)
+        for group, keys in aggregates.__keys(df).items():
+            # rows sorted by key, every key is one slice summed by reduceat
+            order = np.argsort(keys, kind="stable")
+            unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+            if not len(unique):
+                continue
+            sums = np.add.reduceat(values[order], starts)
+            squares = np.add.reduceat(values[order] ** 2, starts)
+            aggregates._tables[group] = {
+                key: [count, sums[i], squares[i]]
+                for i, (key, count) in enumerate(zip(unique.tolist(), counts.tolist()))
+            }
+        return aggregates
+
+    def add(self, row: dict) -> None:
+        self.__apply(row, 1)
+
+    def remove(self, row: dict) -> None:
+        self.__apply(row, -1)
+
+    def table(self, group: str, field: str) -> pd.DataFrame:
+        """Returns `count`, `mean`, `std` and `sem` of `field` for every key of `group`."""
+        position = self._positions[field]
+        keys = sorted(self._tables[group])
+        entries = [self._tables[group][key] for key in keys]
+        count = np.array([entry[0] for entry in entries], dtype=float)
+        sums = np.array([entry[1][position] for entry in entries])
+        squares = np.array([entry[2][position] for entry in entries])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sums / count
+            variance = np.clip(squares - count * mean**2, 0, None) / (count - 1)
+            std = np.sqrt(np.where(count > 1, variance, 0))
+        if group == "weekday":
+            keys = [calendar.day_name[key] for key in keys]
+        elif group == "month":
+            keys = np.array(keys, dtype="datetime64[M]").astype(str).tolist()
+        return pd.DataFrame(
+            {"count": count.astype(int), "mean": mean, "std": std, "sem": std / np.sqrt(count)},
+            index=pd.Index(keys, name=group),
+        )
+
+    def __apply(self, row: dict, sign: int) -> None:
+        vector = np.array([float(row[field]) for field in self.fields])
+        date = pd.Timestamp(row["date"])
+        keys = {
+            "weekday": date.weekday(),
+            "overall_score": int(row["overall_score"]),
+            "month": (date.year - 1970) * 12 + date.month - 1,
+        }
+        for group, key in keys.items():
+            table = self._tables[group]
+            entry = table.setdefault(key, [0, np.zeros(len(self.fields)), np.zeros(len(self.fields))])
+            entry[0] += sign
+            entry[1] += sign * vector
+            entry[2] += sign * vector**2
+            if entry[0] == 0:
+                del table[key]
+
+    @staticmethod
+    def __keys(df: pd.DataFrame) -> dict:
+        dates = pd.to_datetime(df["date"]).to_numpy()
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        return {
+            # 1970-01-01 was a thursday
+            "weekday": (days + 3) % 7,
+            "overall_score": df["overall_score"].to_numpy(dtype=np.int64),
+            "month": dates.astype("datetime64[M]").astype(np.int64),
+        }
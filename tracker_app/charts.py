@@ -0,0 +1,168 @@
+import io
+import multiprocessing
+import matplotlib
+
+# charts are rendered to png in worker processes, they never need a gui backend
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+import numpy as np
+import pandas as pd
+from utils import Colors
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Pool of rendering processes. They are spawned, not forked: a fork copies the locks
+    held by the app's background threads (writer, day cache, compaction) and can deadlock."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+def init_worker() -> None:
+    """Sets the chart style. Runs once in every rendering process."""
+    sns.set_style("dark")
+    sns.set(
+        rc={
+            # "axes.facecolor": Colors.SECONDARY.value,
+            "figure.facecolor": Colors.WHITE.value,
+            # "figure.edgecolor": Colors.SECONDARY.value,
+            # "axes.grid": False,
+            "axes.spines.right": False,
+            "axes.spines.left": False,
+            "axes.spines.top": False,
+            "axes.spines.bottom": False,
+        }
+    )
+
+
+def render(plot, data, size: tuple, dpi: int = 100) -> bytes:
+    """Draws `plot(ax, data)` on a figure of `size` pixels and returns it as png bytes.
+    `plot` has to be a module level function, so it can be sent to a worker process."""
+    fig, ax = plt.subplots(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+    try:
+        plot(ax, data)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def mean_bars(ax, table: pd.DataFrame) -> None:
+    """Bars of `table["mean"]` with ~95% confidence intervals, `table` comes from `Aggregates.table`."""
+    sns.barplot(x=table.index.astype(str), y=table["mean"].to_numpy(), ax=ax)
+    ax.errorbar(
+        range(len(table)),
+        table["mean"],
+        yerr=1.96 * table["sem"].fillna(0),
+        fmt="none",
+        ecolor=Colors.SECONDARY.value,
+    )
+
+
+def sleep_time_per_weekday(ax, table: pd.DataFrame) -> None:
+    mean_bars(ax, table)
+    ax.set(xlabel="Weekday", ylabel="Sleep time")
+    ax.set_title("Sleep time per weekday", fontsize=20)
+
+
+def score_vs_sleep_time(ax, table: pd.DataFrame) -> None:
+    mean_bars(ax, table)
+    ax.set(xlabel="overall_score", ylabel="sleep_time")
+    ax.set_title("Sleep time vs overarall score", fontsize=20)
+
+
+def habit_streaks(ax, table: pd.DataFrame) -> None:
+    """Current and longest streak of every habit, `table` comes from `Habits.streak_table`."""
+    positions = np.arange(len(table))
+    ax.barh(positions + 0.2, table["longest"], height=0.4, color=Colors.THIRD.value, label="longest")
+    ax.barh(positions - 0.2, table["current"], height=0.4, color=Colors.EXTRA.value, label="current")
+    ax.set_yticks(positions, [name.replace("_", " ").title() for name in table.index])
+    ax.set(xlabel="Days in a row")
+    ax.legend()
+    ax.set_title("Habit streaks", fontsize=20)
+
+
+def counter_frequency(ax, table: pd.DataFrame) -> None:
+    """Stacked shares of the values of every counter, `table` comes from `Habits.frequency_table`."""
+    left = np.zeros(len(table))
+    labels = [name.replace("_", " ").title() for name in table.index]
+    for value in table.columns:
+        ax.barh(labels, table[value], left=left, label=str(value))
+        left += table[value].to_numpy()
+    ax.set(xlabel="Share of days")
+    if len(table.columns):
+        ax.legend(title="Value")
+    ax.set_title("How often", fontsize=20)
+
+
+def score_correlations(ax, correlations) -> None:
+    """Pearson correlation of every field with `overall_score` some days later.
+    Cells whose 95% bootstrap interval excludes 0 are starred. `correlations` is a `Correlations`,
+    the bootstrap runs here, in the rendering process."""
+    table = correlations.summary("overall_score")
+    pearson = table.pivot(index="field", columns="lag", values="pearson")
+    significant = table.assign(sure=(table["low"] > 0) | (table["high"] < 0)).pivot(
+        index="field", columns="lag", values="sure"
+    )
+    labels = pearson.applymap(lambda r: "" if np.isnan(r) else f"{r:.2f}")
+    labels = labels + significant.applymap(lambda sure: "*" if sure else "")
+    sns.heatmap(
+        pearson, ax=ax, vmin=-1, vmax=1, cmap="vlag", annot=labels.to_numpy(), fmt="", cbar=False
+    )
+    ax.set_yticklabels([name.replace("_", " ").title() for name in pearson.index], rotation=0)
+    ax.set(xlabel="Days later", ylabel="")
+    ax.set_title("What moves the overall score", fontsize=20)
+
+
+def trend(ax, frame: pd.DataFrame) -> None:
+    """Line of a downsampled series, `frame` comes from `downsample.series`."""
+    label = frame.attrs["field"].replace("_", " ").title()
+    ax.plot(frame["date"], frame["value"], color=Colors.EXTRA.value, marker="." if len(frame) < 60 else None)
+    ax.set(xlabel="Date", ylabel=label)
+    ax.tick_params(axis="x", labelrotation=30)
+    resolution = frame.attrs["resolution"]
+    ax.set_title(label if resolution == "day" else f"{label}, mean per {resolution}", fontsize=20)
+
+
+class ChartCache:
+    """
+    LRU cache of chart renders keyed by (chart name, data version, size).
+    Values are futures of png bytes, so a chart that is still being rendered
+    (e.g. prefetched) is never submitted twice.
+
+    Args:
+        `max_size`: Maximum number of charts kept.
+    """
+
+    def __init__(self, max_size: int = 4) -> None:
+        self.max_size = max_size
+        self._charts = OrderedDict()
+
+    def get(self, name: str, version: int, size: tuple, submit) -> Future:
+        """Returns the cached render, or the future returned by `submit()`."""
+        key = (name, version, size)
+        if key in self._charts:
+            self._charts.move_to_end(key)
+            return self._charts[key]
+        # other versions of this chart will never be asked for again
+        for old_key in [k for k in self._charts if k[0] == name and k[1] != version]:
+            self.__drop(old_key)
+        self._charts[key] = submit()
+        while len(self._charts) > self.max_size:
+            self.__drop(next(iter(self._charts)))
+        return self._charts[key]
+
+    def __drop(self, key: tuple) -> None:
+        # a render that did not start yet is not needed anymore
+        self._charts.pop(key).cancel()
+
+    def __len__(self) -> int:
+        return len(self._charts)
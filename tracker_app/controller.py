@@ -9,8 +9,21 @@ class Controller:
 
     def reset_values(self) -> None:
         self.logger.info("Resetting values")
-        self.model.set_default_values()
+        self.model.reset_values()
+
+    def undo(self) -> bool:
+        self.logger.info("Undoing the last change")
+        return self.model.undo()
+
+    def redo(self) -> bool:
+        self.logger.info("Redoing the last undone change")
+        return self.model.redo()
 
     def save_data(self, data: dict) -> None:
-        self.model.set_values(data)
-        self.model.save()
+        """Saves the values of the current day, raises `ValidationError` if they break a rule."""
+        self.model.save_values(data)
+
+    def save_days(self, days: list) -> None:
+        """Saves the values of many days at once, see `Model.upsert_many`."""
+        self.logger.info(f"Saving {len(days)} days")
+        self.model.upsert_many(days)
@@ -0,0 +1,222 @@
+import copy
+import warnings
+import numpy as np
+import pandas as pd
+from habits import EPOCH
+
+
+class Correlations:
+    """
+    Correlations between all fields, with the second field read `lag` days later
+    (e.g. `gym` today against `overall_score` tomorrow). Pearson correlations come from running
+    sums of the products of every pair of days `lag` days apart, which `add` and `remove`
+    keep up to date for every saved day. Spearman correlations and bootstrap confidence
+    intervals need the whole history, they are computed on demand and cached until the next change.
+    The loaded history is kept as two sorted arrays, the per day dict `add` and `remove` work on
+    is only built on the first change.
+
+    Args:
+        `fields`: Numeric (or boolean) fields to correlate.
+        `lags`: Lags in days.
+        `resamples`: Number of bootstrap resamples.
+    """
+
+    def __init__(self, fields: list, lags: tuple = (0, 1, 2, 3), resamples: int = 200) -> None:
+        self.fields = list(fields)
+        self.lags = tuple(lags)
+        self.resamples = resamples
+        # day (ordinal) -> values of `fields`
+        self._days = {}
+        # sorted days and their values, until the first change moves them to `_days`
+        self._base = None
+        size = len(self.fields)
+        # lag -> [pairs, sums of the first day, sums of the second day,
+        #         squares of the first day, squares of the second day, products]
+        self._moments = {
+            lag: [0, np.zeros(size), np.zeros(size), np.zeros(size), np.zeros(size), np.zeros((size, size))]
+            for lag in self.lags
+        }
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fields: list, **kwargs) -> "Correlations":
+        correlations = cls(fields, **kwargs)
+        days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(np.int64) + EPOCH
+        values = df[correlations.fields].to_numpy(dtype=float)
+        order = np.argsort(days, kind="stable")
+        correlations._base = (days[order], values[order])
+        for lag in correlations.lags:
+            first, second = correlations.__pairs(lag)
+            correlations._moments[lag] = [
+                len(first),
+                first.sum(axis=0),
+                second.sum(axis=0),
+                (first**2).sum(axis=0),
+                (second**2).sum(axis=0),
+                first.T @ second,
+            ]
+        return correlations
+
+    def snapshot(self) -> "Correlations":
+        """Copy holding the history as arrays, cheap to pickle and unaffected by later changes.
+        Used to compute the summary in another process."""
+        snapshot = Correlations(self.fields, self.lags, self.resamples)
+        days, values = self.__arrays()
+        snapshot._base = (days.copy(), values.copy())
+        snapshot._moments = copy.deepcopy(self._moments)
+        return snapshot
+
+    def add(self, row: dict) -> None:
+        self.__unpack()
+        day = pd.Timestamp(row["date"]).toordinal()
+        vector = np.array([float(row[field]) for field in self.fields])
+        self._days[day] = vector
+        self.__apply(day, vector, 1)
+
+    def remove(self, row: dict) -> None:
+        self.__unpack()
+        day = pd.Timestamp(row["date"]).toordinal()
+        vector = self._days.get(day)
+        if vector is None:
+            return
+        self.__apply(day, vector, -1)
+        del self._days[day]
+
+    def pearson(self, lag: int = 0) -> pd.DataFrame:
+        """Pearson correlation of every field (rows) with every field `lag` days later (columns)."""
+        n, first, second, first_squares, second_squares, products = self._moments[lag]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = products / n - np.outer(first / n, second / n)
+            first_variance = first_squares / n - (first / n) ** 2
+            second_variance = second_squares / n - (second / n) ** 2
+            r = covariance / np.sqrt(np.outer(first_variance, second_variance))
+        # constant fields have no correlation
+        r = np.where(np.outer(first_variance > 1e-12, second_variance > 1e-12), r, np.nan)
+        return pd.DataFrame(np.clip(r, -1, 1), index=self.fields, columns=self.fields)
+
+    def spearman(self, lag: int = 0) -> pd.DataFrame:
+        """Spearman correlation, the Pearson correlation of the ranks."""
+        return self.__cached(("spearman", lag), lambda: self.__spearman(lag))
+
+    def summary(self, target: str = "overall_score") -> pd.DataFrame:
+        """Pearson and Spearman correlations of every other field with `target` read `lag` days
+        later, with a 95% bootstrap confidence interval of the Pearson correlation."""
+        return self.__cached(("summary", target), lambda: self.__summary(target))
+
+    def __summary(self, target: str) -> pd.DataFrame:
+        position = self.fields.index(target)
+        others = [field for field in self.fields if field != target]
+        frames = []
+        for lag in self.lags:
+            low, high = self.__bootstrap(lag, position)
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "field": self.fields,
+                        "lag": lag,
+                        "pearson": self.pearson(lag)[target].to_numpy(),
+                        "spearman": self.spearman(lag)[target].to_numpy(),
+                        "low": low,
+                        "high": high,
+                    }
+                )
+            )
+        table = pd.concat(frames, ignore_index=True)
+        return table[table["field"].isin(others)].reset_index(drop=True)
+
+    def __spearman(self, lag: int) -> pd.DataFrame:
+        first, second = self.__pairs(lag)
+        if len(first) < 3:
+            return pd.DataFrame(np.nan, index=self.fields, columns=self.fields)
+        r = _pearson_columns(_ranks(first)[None], _ranks(second)[None])[0]
+        return pd.DataFrame(r, index=self.fields, columns=self.fields)
+
+    def __bootstrap(self, lag: int, position: int) -> tuple:
+        """2.5% and 97.5% percentiles of the correlation of every field with field `position`."""
+        first, second = self.__pairs(lag)
+        if len(first) < 3:
+            nan = np.full(len(self.fields), np.nan)
+            return nan, nan
+        # the same resamples for every version, so intervals only move with the data
+        rng = np.random.default_rng(len(first))
+        samples = rng.integers(0, len(first), size=(self.resamples, len(first)))
+        target = second[:, [position]]
+        # resampled in batches, so memory does not grow with resamples x days x fields
+        r = np.concatenate(
+            [
+                _pearson_columns(first[batch], target[batch])[:, :, 0]
+                for batch in np.array_split(samples, max(1, self.resamples // 50))
+            ]
+        )
+        with warnings.catch_warnings():
+            # constant fields have only nan correlations
+            warnings.simplefilter("ignore", RuntimeWarning)
+            low, high = np.nanpercentile(r, [2.5, 97.5], axis=0)
+        return low, high
+
+    def __pairs(self, lag: int) -> tuple:
+        """Values of every pair of stored days `lag` days apart, as two aligned arrays."""
+        days, values = self.__arrays()
+        if not len(days):
+            return values, values
+        later = np.searchsorted(days, days + lag).clip(max=len(days) - 1)
+        paired = days[later] == days + lag
+        return values[paired], values[later[paired]]
+
+    def __arrays(self) -> tuple:
+        """Sorted stored days and their values."""
+        if self._base is not None:
+            return self._base
+        return self.__cached(("arrays",), self.__stack)
+
+    def __stack(self) -> tuple:
+        if not self._days:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(self.fields)))
+        days = np.fromiter(self._days, dtype=np.int64, count=len(self._days))
+        order = np.argsort(days)
+        return days[order], np.stack(list(self._days.values()))[order]
+
+    def __unpack(self) -> None:
+        if self._base is not None:
+            days, values = self._base
+            self._days = dict(zip(days.tolist(), values))
+            self._base = None
+
+    def __apply(self, day: int, vector: np.ndarray, sign: int) -> None:
+        for lag in self.lags:
+            pairs = [(vector, vector)] if lag == 0 else []
+            if lag and day - lag in self._days:
+                pairs.append((self._days[day - lag], vector))
+            if lag and day + lag in self._days:
+                pairs.append((vector, self._days[day + lag]))
+            moments = self._moments[lag]
+            for first, second in pairs:
+                moments[0] += sign
+                moments[1] += sign * first
+                moments[2] += sign * second
+                moments[3] += sign * first**2
+                moments[4] += sign * second**2
+                moments[5] += sign * np.outer(first, second)
+        self._cache.clear()
+
+    def __cached(self, key: tuple, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks of every column, ties get their average rank."""
+    return pd.DataFrame(values).rank().to_numpy()
+
+
+def _pearson_columns(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Pearson correlation of every column of `first` with every column of `second`,
+    for each leading batch index. Shapes `(b, n, k)` and `(b, n, m)` give `(b, k, m)`."""
+    first = first - first.mean(axis=1, keepdims=True)
+    second = second - second.mean(axis=1, keepdims=True)
+    covariance = np.einsum("bnk,bnm->bkm", first, second)
+    norms = np.einsum("bk,bm->bkm", np.sqrt((first**2).sum(axis=1)), np.sqrt((second**2).sum(axis=1)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = covariance / norms
+    return np.where(norms > 1e-12, np.clip(r, -1, 1), np.nan)
@@ -0,0 +1,99 @@
+import threading
+import pandas as pd
+from logging import Logger
+
+
+class DayCache:
+    """
+    Keeps the decoded records of the days around the current date warm, so day navigation
+    does not have to read the data. Days in a window of `radius` days around the current date
+    are read in a background thread, the ones in the direction of travel first.
+    Days without data are cached as `None`.
+
+    Args:
+        `read_day`: Callable returning the record of a date, or `None` if it has no data.
+        `logger`: Logger for this class.
+        `radius`: Number of days kept on each side of the current date.
+    """
+
+    def __init__(self, read_day, logger: Logger, radius: int = 14) -> None:
+        self.radius = radius
+        self._read_day = read_day
+        self._logger = logger
+        self._days = {}
+        self._target = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def get(self, date: pd.Timestamp):
+        """Returns the record of `date`, reading it right away on a cache miss."""
+        with self._lock:
+            if date in self._days:
+                return self._days[date]
+        self._logger.debug(f"Day cache miss for {date}")
+        fields = self._read_day(date)
+        with self._lock:
+            self._days[date] = fields
+        return fields
+
+    def put(self, date: pd.Timestamp, record) -> None:
+        """Stores a freshly saved record of `date`. It must not be modified afterwards."""
+        with self._lock:
+            self._days[date] = record
+
+    def prefetch(self, date: pd.Timestamp, direction: int = 1) -> None:
+        """Moves the window to `date`, days after it are read first if `direction` > 0."""
+        with self._lock:
+            self._target = (date, direction)
+            self._idle.clear()
+            self._wakeup.notify()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Waits until the window around the last prefetched date is filled."""
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: float = None) -> None:
+        """Stops the background thread, `get` keeps reading missed days directly."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def __window(self, date: pd.Timestamp, direction: int) -> list:
+        ahead = [date + pd.Timedelta(days=i * direction) for i in range(1, self.radius + 1)]
+        behind = [date - pd.Timedelta(days=i * direction) for i in range(1, self.radius + 1)]
+        return [date, *ahead, *behind]
+
+    def __run(self) -> None:
+        while True:
+            with self._lock:
+                while self._target is None and not self._closed:
+                    self._idle.set()
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                target = self._target
+                self._target = None
+                date, direction = target
+                # forget days that left the window
+                lo, hi = date - pd.Timedelta(days=self.radius), date + pd.Timedelta(days=self.radius)
+                self._days = {d: f for d, f in self._days.items() if lo <= d <= hi}
+            for day in self.__window(date, direction):
+                with self._lock:
+                    if self._target is not None or self._closed:
+                        # the user moved on, start over from the new date
+                        break
+                    if day in self._days:
+                        continue
+                fields = self._read_day(day)
+                with self._lock:
+                    self._days.setdefault(day, fields)
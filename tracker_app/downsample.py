@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# `(name, days)` of the coarser resolutions, the first one within the point budget is used
+RESOLUTIONS = (("week", 7), ("month", 30.44))
+
+
+def max_points(width: float, pixels_per_point: float = 4) -> int:
+    """Number of points worth drawing on a chart `width` pixels wide."""
+    return max(2, int(width // pixels_per_point))
+
+
+def bucket_means(dates: np.ndarray, values: np.ndarray, resolution: str) -> tuple:
+    """Returns `(dates, values)` with the mean of every week (starting on monday) or month
+    that has data. `dates` have to be sorted."""
+    days = dates.astype("datetime64[D]")
+    if resolution == "week":
+        # 1970-01-01 was a thursday
+        starts = days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    elif resolution == "month":
+        starts = days.astype("datetime64[M]").astype("datetime64[D]")
+    else:
+        raise ValueError(f"Unknown resolution {resolution}")
+    keys, first, counts = np.unique(starts, return_index=True, return_counts=True)
+    sums = np.add.reduceat(values.astype(float), first) if len(first) else np.zeros(0)
+    return keys.astype("datetime64[ns]"), sums / counts
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: returns the indices of `threshold` points
+    that keep the visual shape of the line `x`, `y` (first and last point always kept)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    y = y.astype(float)
+    # bucket edges of the points between the first and the last one
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    # mean of every bucket, used as the third corner of the triangles of the previous bucket
+    sums_x = np.add.reduceat(x[1 : n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x / sizes, x[-1])
+    mean_y = np.append(sums_y / sizes, y[-1])
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        previous = lo + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(dates: np.ndarray, values: np.ndarray, points: int) -> tuple:
+    """Returns `(dates, values, resolution)` of a series with at most `points` points.
+    Daily data is averaged per week or per month if that is enough, longer histories
+    are reduced further with LTTB on the monthly means. `dates` have to be sorted."""
+    if len(dates) <= points:
+        return dates, values, "day"
+    span = (dates[-1] - dates[0]) / np.timedelta64(1, "D")
+    for resolution, days in RESOLUTIONS:
+        # a span can touch one bucket more than it covers
+        if span / days + 2 <= points:
+            return (*bucket_means(dates, values, resolution), resolution)
+    dates, values = bucket_means(dates, values, "month")
+    keep = lttb(dates.astype(np.int64), values, points)
+    return dates[keep], values[keep], "month"
+
+
+def series(field: str, dates: np.ndarray, values: np.ndarray, width: float) -> pd.DataFrame:
+    """Downsampled `date`/`value` frame of `field` for a chart `width` pixels wide.
+    `field` and the resolution are kept in `frame.attrs`."""
+    dates, values, resolution = downsample(dates, values, max_points(width))
+    frame = pd.DataFrame({"date": dates, "value": values})
+    frame.attrs.update(field=field, resolution=resolution)
+    return frame
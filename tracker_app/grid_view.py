@@ -0,0 +1,250 @@
+from flet import UserControl
+from utils import CONFIG, Colors
+import flet as ft
+import pandas as pd
+from model import Model, DayRecord
+from schema import SCHEMA
+from controller import Controller
+from logging import Logger
+
+
+class GridView(UserControl):
+    """
+    Grid of the days of one week or month, one row per day and one column per field,
+    for backfilling many days at once. Only the days with edited cells are saved,
+    all of them together in one `Model.upsert_many` batch (one validation pass, one write).
+    Days without data start with the default values and stay unsaved until edited.
+    """
+
+    PERIODS = ("week", "month")
+
+    def __init__(self, model: Model, controller: Controller, logger: Logger):
+        super().__init__()
+        self.logger = logger
+        self.model = model
+        self.controller = controller
+        self.period = "week"
+        self.start = self._period_start(model.date)
+        # (date, field) -> control of the cell
+        self.cells = {}
+        self.edited = set()
+        self.table_container = None
+        self.period_text = None
+        self.status_text = None
+
+    def _period_start(self, date: pd.Timestamp) -> pd.Timestamp:
+        date = pd.Timestamp(date).normalize()
+        if self.period == "week":
+            return date - pd.Timedelta(days=date.weekday())
+        return date.replace(day=1)
+
+    @property
+    def end(self) -> pd.Timestamp:
+        if self.period == "week":
+            return self.start + pd.Timedelta(days=6)
+        return self.start + pd.offsets.MonthEnd(0)
+
+    @property
+    def days(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.start, self.end, freq="D")
+
+    def _stored_values(self) -> dict:
+        """`{date: {field: value}}` of every day of the period, defaults for days without data."""
+        stored = self.model.range(self.start, self.end)
+        rows = {row["date"]: row for row in stored.to_dict("records")}
+        return {day: rows.get(day) or DayRecord(date=day).as_dict() for day in self.days}
+
+    def cell(self, field, date: pd.Timestamp, value) -> ft.Control:
+        key = (date, field.name)
+        if field.widget == "tile":
+            return ft.Checkbox(
+                value=bool(value),
+                fill_color=Colors.EXTRA.value,
+                data=key,
+                on_change=self._on_cell_change,
+            )
+        if field.widget in ("radio", "slider"):
+            options = (
+                field.options
+                if field.widget == "radio"
+                else range(int(field.min), int(field.max) + 1)
+            )
+            return ft.Dropdown(
+                value=str(value) if value in options else None,
+                options=[ft.dropdown.Option(str(option)) for option in options],
+                width=70,
+                dense=True,
+                data=key,
+                on_change=self._on_cell_change,
+            )
+        return ft.TextField(
+            value=str(value) if float(value) != 0 else None,
+            width=70,
+            dense=True,
+            color=Colors.EXTRA2.value,
+            border_color=Colors.EXTRA2.value,
+            cursor_color=Colors.EXTRA2.value,
+            data=key,
+            on_change=self._on_cell_change,
+        )
+
+    @property
+    def fields(self) -> list:
+        return [field for field in SCHEMA if field.widget in ("tile", "radio", "slider", "text")]
+
+    @property
+    def table(self) -> ft.DataTable:
+        self.cells = {}
+        self.edited = set()
+        rows = []
+        for day, values in self._stored_values().items():
+            cells = [ft.DataCell(ft.Text(day.strftime("%a %d.%m"), color=Colors.EXTRA2.value))]
+            for field in self.fields:
+                control = self.cell(field, day, values[field.name])
+                self.cells[(day, field.name)] = control
+                cells.append(ft.DataCell(control))
+            rows.append(ft.DataRow(cells=cells))
+        return ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("day")),
+                *(ft.DataColumn(ft.Text(field.label)) for field in self.fields),
+            ],
+            rows=rows,
+            column_spacing=10,
+            data_row_height=50,
+        )
+
+    def _period_label(self) -> str:
+        if self.period == "week":
+            return f"{self.start.date()} - {self.end.date()}"
+        return self.start.strftime("%B %Y")
+
+    @property
+    def header(self):
+        self.period_text = ft.Text(
+            self._period_label(),
+            style=ft.TextThemeStyle.TITLE_LARGE,
+            color=Colors.EXTRA2.value,
+        )
+        self.status_text = ft.Text("", color=Colors.EXTRA2.value)
+        return ft.Row(
+            [
+                ft.Row(
+                    [
+                        ft.IconButton(
+                            icon=ft.icons.ARROW_BACK_OUTLINED,
+                            icon_color=Colors.EXTRA2.value,
+                            on_click=self._on_previous_click,
+                        ),
+                        self.period_text,
+                        ft.IconButton(
+                            icon=ft.icons.ARROW_FORWARD_OUTLINED,
+                            icon_color=Colors.EXTRA2.value,
+                            on_click=self._on_next_click,
+                        ),
+                        ft.Dropdown(
+                            value=self.period,
+                            options=[ft.dropdown.Option(period) for period in self.PERIODS],
+                            width=110,
+                            dense=True,
+                            on_change=self._on_period_change,
+                        ),
+                    ]
+                ),
+                ft.Row(
+                    [
+                        self.status_text,
+                        ft.ElevatedButton(
+                            "save all",
+                            color=Colors.SECONDARY.value,
+                            bgcolor=Colors.EXTRA.value,
+                            icon=ft.icons.SAVE,
+                            on_click=self._on_save_click,
+                        ),
+                        ft.IconButton(
+                            icon=ft.icons.CLOSE_OUTLINED,
+                            on_click=self._on_close_button_click,
+                        ),
+                    ]
+                ),
+            ],
+            alignment="spaceBetween",
+            width=CONFIG.window_width / 1.05,
+        )
+
+    def _edited_values(self) -> list:
+        """Values of the days with edited cells, empty cells get the default value."""
+        days = []
+        for day in sorted(self.edited):
+            values = {"date": day}
+            for field in self.fields:
+                value = self.cells[(day, field.name)].value
+                if value is not None and value != "":
+                    values[field.name] = value
+            days.append(values)
+        return days
+
+    def _on_cell_change(self, e) -> None:
+        date, field = e.control.data
+        self.edited.add(date)
+        self._set_status(f"{len(self.edited)} day(s) edited")
+
+    def _on_save_click(self, e) -> None:
+        days = self._edited_values()
+        if not days:
+            self._set_status("Nothing to save")
+            return
+        try:
+            self.controller.save_days(days)
+        except ValueError as exc:
+            # the whole batch is rejected, the edits stay in the grid
+            self.logger.warning(f"Could not save {len(days)} days: {exc}")
+            self._set_status(str(exc).splitlines()[0])
+            return
+        self.edited = set()
+        self._set_status(f"Saved {len(days)} day(s)")
+
+    def _set_status(self, text: str) -> None:
+        self.status_text.value = text
+        if self.status_text.page is not None:
+            self.status_text.update()
+
+    def _move(self, periods: int) -> None:
+        if self.period == "week":
+            self.start = self.start + pd.Timedelta(days=7 * periods)
+        else:
+            self.start = self.start + pd.DateOffset(months=periods)
+        self.refresh()
+        self.update()
+
+    def _on_previous_click(self, e) -> None:
+        self._move(-1)
+
+    def _on_next_click(self, e) -> None:
+        self._move(1)
+
+    def _on_period_change(self, e) -> None:
+        self.period = e.control.value
+        self.start = self._period_start(self.start)
+        self.refresh()
+        self.update()
+
+    def _on_close_button_click(self, e):
+        e.page.route = "/"
+        e.page.update()
+
+    def refresh(self) -> None:
+        """Shows the current period, unsaved edits of the previous one are dropped."""
+        self.period_text.value = self._period_label()
+        self.status_text.value = ""
+        self.table_container.content = self.table
+
+    def build(self):
+        self.table_container = ft.Container(content=self.table)
+        return ft.Column(
+            [
+                self.header,
+                ft.Column([self.table_container], scroll="auto", expand=True),
+            ],
+            height=CONFIG.window_height / 1.1,
+        )
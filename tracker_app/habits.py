@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from collections import Counter
+from schema import Schema, SCHEMA
+
+EPOCH = pd.Timestamp("1970-01-01").toordinal()
+
+
+class Habits:
+    """
+    Current and longest streaks of the boolean habits and value counts of the counters.
+    A habit is kept on a day if its value equals the goal (`True` for `gym`, `False` for
+    `fast_food`, see `habit` in `schema.yaml`), a streak is a run of consecutive
+    stored days on which it was kept. Built once from the loaded data, then kept up to date
+    by `add` and `remove` for every saved day. Editing a day only walks the run it belongs to.
+
+    Args:
+        `goals`: `{habit: value that keeps it}`.
+        `counters`: Integer fields to count the values of.
+    """
+
+    def __init__(self, goals: dict, counters: list) -> None:
+        self.goals = dict(goals)
+        self.counters = list(counters)
+        # habit -> days (ordinals) on which it was kept
+        self._kept = {habit: set() for habit in self.goals}
+        # habit -> run start -> run end, and the other way around
+        self._ends = {habit: {} for habit in self.goals}
+        self._starts = {habit: {} for habit in self.goals}
+        # habit -> run length -> number of runs
+        self._lengths = {habit: Counter() for habit in self.goals}
+        self._counts = {counter: Counter() for counter in self.counters}
+
+    @classmethod
+    def from_schema(cls, schema: Schema = SCHEMA) -> "Habits":
+        goals = {f.name: f.habit == "done" for f in schema if f.habit is not None}
+        counters = [f.name for f in schema if f.widget == "radio"]
+        return cls(goals, counters)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, schema: Schema = SCHEMA) -> "Habits":
+        habits = cls.from_schema(schema)
+        # proleptic ordinals, the same numbers `pd.Timestamp.toordinal` gives
+        days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(int) + EPOCH
+        for habit, goal in habits.goals.items():
+            kept = np.unique(days[df[habit].to_numpy(dtype=bool) == goal]).astype(int)
+            habits._kept[habit] = set(kept.tolist())
+            # runs break where consecutive kept days are more than a day apart
+            breaks = np.flatnonzero(np.diff(kept) != 1)
+            starts = np.concatenate((kept[:1], kept[breaks + 1]))
+            ends = np.concatenate((kept[breaks], kept[-1:]))
+            habits._ends[habit] = dict(zip(starts.tolist(), ends.tolist()))
+            habits._starts[habit] = dict(zip(ends.tolist(), starts.tolist()))
+            habits._lengths[habit] = Counter((ends - starts + 1).tolist())
+        for counter in habits.counters:
+            habits._counts[counter] = Counter(df[counter].astype(int).tolist())
+        return habits
+
+    def add(self, row: dict) -> None:
+        day = pd.Timestamp(row["date"]).toordinal()
+        for habit, goal in self.goals.items():
+            if bool(row[habit]) == goal:
+                self.__keep(habit, day)
+        for counter in self.counters:
+            self._counts[counter][int(row[counter])] += 1
+
+    def remove(self, row: dict) -> None:
+        day = pd.Timestamp(row["date"]).toordinal()
+        for habit in self.goals:
+            self.__break(habit, day)
+        for counter in self.counters:
+            counts = self._counts[counter]
+            counts[int(row[counter])] -= 1
+            if counts[int(row[counter])] <= 0:
+                del counts[int(row[counter])]
+
+    def current(self, habit: str, today: pd.Timestamp = None) -> int:
+        """Length of the streak going through today, or through yesterday if today
+        is not kept (yet)."""
+        today = pd.Timestamp.today() if today is None else pd.Timestamp(today)
+        kept = self._kept[habit]
+        for day in (today.toordinal(), today.toordinal() - 1):
+            if day in kept:
+                start, end = self.__run(habit, day)
+                return day - start + 1
+        return 0
+
+    def longest(self, habit: str) -> int:
+        lengths = self._lengths[habit]
+        return max(lengths) if lengths else 0
+
+    def frequency(self, counter: str) -> pd.Series:
+        """Share of the filled in days (value >= 0) with each value of `counter`."""
+        counts = pd.Series(
+            {value: n for value, n in self._counts[counter].items() if value >= 0}, dtype=float
+        ).sort_index()
+        return counts / counts.sum() if counts.sum() else counts
+
+    def streak_table(self, today: pd.Timestamp = None) -> pd.DataFrame:
+        """`current` and `longest` streak of every habit."""
+        return pd.DataFrame(
+            {
+                "current": [self.current(habit, today) for habit in self.goals],
+                "longest": [self.longest(habit) for habit in self.goals],
+            },
+            index=pd.Index(list(self.goals), name="habit"),
+        )
+
+    def frequency_table(self) -> pd.DataFrame:
+        """`frequency` of every counter, one column per value."""
+        table = pd.DataFrame({c: self.frequency(c) for c in self.counters}).T.fillna(0.0)
+        return table.reindex(columns=sorted(table.columns)).rename_axis("counter")
+
+    def __run(self, habit: str, day: int) -> tuple:
+        """Returns `(start, end)` of the run containing the kept `day`."""
+        end = day
+        while end + 1 in self._kept[habit]:
+            end += 1
+        return self._starts[habit][end], end
+
+    def __add_run(self, habit: str, start: int, end: int) -> None:
+        self._ends[habit][start] = end
+        self._starts[habit][end] = start
+        self._lengths[habit][end - start + 1] += 1
+
+    def __drop_run(self, habit: str, start: int, end: int) -> None:
+        del self._ends[habit][start]
+        del self._starts[habit][end]
+        lengths = self._lengths[habit]
+        lengths[end - start + 1] -= 1
+        if lengths[end - start + 1] == 0:
+            del lengths[end - start + 1]
+
+    def __keep(self, habit: str, day: int) -> None:
+        kept = self._kept[habit]
+        if day in kept:
+            return
+        start = end = day
+        # join the runs ending the day before and starting the day after
+        if day - 1 in kept:
+            start = self._starts[habit][day - 1]
+            self.__drop_run(habit, start, day - 1)
+        if day + 1 in kept:
+            end = self._ends[habit][day + 1]
+            self.__drop_run(habit, day + 1, end)
+        kept.add(day)
+        self.__add_run(habit, start, end)
+
+    def __break(self, habit: str, day: int) -> None:
+        kept = self._kept[habit]
+        if day not in kept:
+            return
+        start, end = self.__run(habit, day)
+        self.__drop_run(habit, start, end)
+        kept.discard(day)
+        if start < day:
+            self.__add_run(habit, start, day - 1)
+        if day < end:
+            self.__add_run(habit, day + 1, end)
@@ -0,0 +1,197 @@
+import json
+import datetime
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    One entry of the edit history: the fields of one day that changed.
+
+    Args:
+        `date`: Day that changed.
+        `before`: `{field: value}` of the changed fields before, `None` if the day was not stored.
+        `after`: `{field: value}` of the changed fields after, `None` if the day was removed.
+        `kind`: `save`, `undo` or `redo`.
+        `time`: When the change was made.
+    """
+
+    date: pd.Timestamp
+    before: dict
+    after: dict
+    kind: str = "save"
+    time: datetime.datetime = field(default_factory=datetime.datetime.now)
+
+    @classmethod
+    def between(cls, date: pd.Timestamp, old: dict, new: dict) -> "Change":
+        """Delta between two versions of a day, `None` for a day that is not stored.
+        Returns `None` if nothing changed."""
+        if old is None or new is None:
+            return cls(date, old, new)
+        changed = [k for k in new if k != "date" and old[k] != new[k]]
+        if not changed:
+            return None
+        return cls(date, {k: old[k] for k in changed}, {k: new[k] for k in changed})
+
+    def inverse(self, kind: str) -> "Change":
+        return Change(self.date, self.after, self.before, kind)
+
+    def apply(self, rows: dict) -> None:
+        """Applies the change to `{date: {field: value}}`."""
+        if self.after is None:
+            rows.pop(self.date, None)
+        else:
+            rows.setdefault(self.date, {}).update(self.after)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "time": self.time.isoformat(timespec="seconds"),
+                "kind": self.kind,
+                "date": self.date.strftime("%Y-%m-%d"),
+                "before": _plain(self.before),
+                "after": _plain(self.after),
+            }
+        )
+
+
+class EditHistory:
+    """
+    Append-only history of the changes of the stored days. Entries hold only the fields
+    that changed, undo and redo are appended as entries too, so the history is
+    also an audit trail. Changes saved together (e.g. a batch of days) are undone together,
+    undo and redo pop a stack of entry ranges, O(1) per change.
+    Every `checkpoint_every` entries the whole table is kept as a compact numpy record array,
+    only the last `max_checkpoints` are kept. A version is rebuilt from the nearest checkpoint
+    (or the current table) by replaying the changes in between, forwards or backwards,
+    so no rebuild replays more than `checkpoint_every / 2` entries (plus one batch).
+    When the oldest checkpoint is dropped, the entries before the next one go with it:
+    older versions can no longer be rebuilt or undone. Every entry still reaches `unwritten`.
+
+    Args:
+        `checkpoint_every`: Number of entries between checkpoints.
+        `max_checkpoints`: Number of checkpoints kept, the oldest one is dropped first.
+    """
+
+    def __init__(self, checkpoint_every: int = 50, max_checkpoints: int = 8) -> None:
+        self.checkpoint_every = checkpoint_every
+        self.max_checkpoints = max_checkpoints
+        # `entries[0]` is the change made after version `oldest`
+        self.entries = []
+        self.oldest = 0
+        self._checkpoints = {}
+        self._undo = []
+        self._redo = []
+        self._unwritten = []
+
+    @property
+    def version(self) -> int:
+        """Number of changes made so far, the version of the table after the last one."""
+        return self.oldest + len(self.entries)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def record(self, changes: list, table) -> None:
+        """Appends `changes` saved together. `table()` returns the table after them,
+        it is only called when a checkpoint is taken. Clears the redo stack."""
+        self._undo.append(self.__append(changes, table))
+        self._redo.clear()
+
+    def undo(self, apply, table) -> list:
+        """Reverts the last saved (or redone) changes and returns the reverting changes,
+        an empty list if there is nothing to undo.
+        `apply(change)` has to apply one change, `table()` returns the table after all of them."""
+        if not self._undo:
+            return []
+        return self.__replay(self._undo.pop(), "undo", apply, table, self._redo)
+
+    def redo(self, apply, table) -> list:
+        """Repeats the last undone changes, see `undo`."""
+        if not self._redo:
+            return []
+        return self.__replay(self._redo.pop(), "redo", apply, table, self._undo)
+
+    def at(self, version: int, data: pd.DataFrame) -> pd.DataFrame:
+        """Rebuilds the table as it was after the first `version` entries.
+        `data` is the current table, the one after every entry."""
+        if not self.oldest <= version <= self.version:
+            raise ValueError(
+                f"Version {version} is not kept, versions {self.oldest}-{self.version} are."
+            )
+        start = min([*self._checkpoints, self.version], key=lambda v: abs(v - version))
+        if start in self._checkpoints:
+            checkpoint = self._checkpoints[start]
+        else:
+            checkpoint = data.to_records(index=False)
+        rows = {pd.Timestamp(r["date"]): dict(zip(checkpoint.dtype.names, r.tolist())) for r in checkpoint}
+        for change in self.__slice(start, version):
+            change.apply(rows)
+        # newer reference, the changes in between are reverted from the last one
+        for change in reversed(self.__slice(version, start)):
+            change.inverse(change.kind).apply(rows)
+        df = pd.DataFrame(
+            [{**row, "date": date} for date, row in sorted(rows.items())],
+            columns=list(checkpoint.dtype.names),
+        )
+        # back to the column types of the checkpoint
+        return df.astype({name: checkpoint.dtype[name] for name in checkpoint.dtype.names})
+
+    def prepend(self, rows: pd.DataFrame) -> None:
+        """Adds days older than the ones in the checkpoints, read after the checkpoints were taken.
+        Such days were never changed, they are the same in every version."""
+        records = rows.to_records(index=False)
+        for version, checkpoint in self._checkpoints.items():
+            self._checkpoints[version] = np.concatenate([records.astype(checkpoint.dtype), checkpoint])
+
+    def unwritten(self) -> list:
+        """Returns the entries not returned by an earlier call, for the audit log file."""
+        entries, self._unwritten = self._unwritten, []
+        return entries
+
+    def __slice(self, start: int, end: int) -> list:
+        return self.entries[start - self.oldest : end - self.oldest] if start < end else []
+
+    def __replay(self, positions: range, kind: str, apply, table, stack: list) -> list:
+        # the last change is reverted first
+        changes = [self.entries[pos - self.oldest].inverse(kind) for pos in reversed(positions)]
+        for change in changes:
+            apply(change)
+        stack.append(self.__append(changes, table))
+        return changes
+
+    def __append(self, changes: list, table) -> range:
+        start = self.version
+        self.entries.extend(changes)
+        self._unwritten.extend(changes)
+        positions = range(start, self.version)
+        if self.version // self.checkpoint_every > start // self.checkpoint_every:
+            self._checkpoints[self.version] = table().to_records(index=False)
+            if len(self._checkpoints) > self.max_checkpoints:
+                del self._checkpoints[min(self._checkpoints)]
+                self.__forget(min(self._checkpoints))
+        return positions
+
+    def __forget(self, version: int) -> None:
+        """Drops the entries before `version`, with the undo and redo steps using them."""
+        del self.entries[: version - self.oldest]
+        self.oldest = version
+        for stack in (self._undo, self._redo):
+            stack[:] = [positions for positions in stack if positions.start >= version]
+
+
+def _plain(values: dict) -> dict:
+    """`values` with numpy scalars turned into json friendly python values."""
+    if values is None:
+        return None
+    return {
+        k: v.strftime("%Y-%m-%d") if isinstance(v, datetime.date) else np.asarray(v).item()
+        for k, v in values.items()
+    }
@@ -1,14 +1,16 @@
+from utils import CONFIG, Colors, STARTUP
 from flet import Page
-from utils import CONFIG, Colors
 import flet as ft
 from model import Model
 from controller import Controller
 from main_view import MainView
-from statistic_view import StatisticView
 from miskibin import get_logger
 from datetime import datetime
 from pathlib import Path
-import yaml
+import multiprocessing
+import atexit
+
+STARTUP.mark("imports")
 
 
 def init_page(page: Page):
@@ -34,25 +36,52 @@ def main(page: Page):
         format="%(levelname)-8s:: %(asctime)-9s:: %(message)s (%(filename)s:%(lineno)d)",
     )
     model = Model(_logger=logger)
+    STARTUP.mark("model")
     controller = Controller(model, logger)
     main_view = MainView(model, controller, logger)
-    statisitcs_view = StatisticView(model, controller, logger)
+    # the plotting stack is imported when the statistics are opened for the first time
+    statisitcs_view = None
+    grid_view = None
     page = init_page(page)
     page.add(main_view)
     page.update()
+    STARTUP.mark("first render")
+    if STARTUP.enabled:
+        logger.debug(f"Startup report:\n{STARTUP.report()}")
 
     def on_route_change(e: ft.Event):
-        nonlocal page
+        nonlocal page, statisitcs_view, grid_view
         e.page.controls.pop()
         print(page.route)
         if page.route == "/":
+            # days may have been edited in the grid
+            main_view.refresh()
             page.controls.append(main_view)
+        elif page.route == "/grid":
+            if grid_view is None:
+                from grid_view import GridView
+
+                grid_view = GridView(model, controller, logger)
+            else:
+                # days may have been saved from the main view
+                grid_view.refresh()
+            page.controls.append(grid_view)
         elif page.route == "/statistics":
+            if statisitcs_view is None:
+                from statistic_view import StatisticView
+
+                statisitcs_view = StatisticView(model, controller, logger)
+                atexit.register(statisitcs_view.close)
             page.controls.append(statisitcs_view)
         page.update()
 
     page.on_route_change = on_route_change
+    # saves are written in the background, write the pending ones before the app exits
+    page.on_disconnect = lambda e: model.flush(timeout=5)
+    atexit.register(model.close, timeout=5)
 
 
 if __name__ == "__main__":
+    # charts are rendered in worker processes, which need this in the frozen app
+    multiprocessing.freeze_support()
     ft.app(target=main)
@@ -2,20 +2,14 @@ from flet import Column, UserControl
 from utils import CONFIG, Colors
 import flet as ft
 from model import Model
-from datetime import datetime, date
+from schema import SCHEMA
+from datetime import datetime
 from controller import Controller
+from validation import ValidationError
 from logging import Logger
-import numpy as np
 
 SAVED = False
 
-ICONS = {
-    "gym": ft.icons.FITNESS_CENTER,
-    "code_tasks": ft.icons.CODE,
-    "fast_food": ft.icons.EGG_ALT_OUTLINED,
-    "chess_tasks": ft.icons.CHURCH_OUTLINED,
-}
-
 
 class MainView(UserControl):
     def __init__(self, model: Model, controller: Controller, logger: Logger):
@@ -27,30 +21,32 @@ class MainView(UserControl):
         self.tiles = []
         self.radios = []
         self.slider = None
+        self.date_text = None
+        self.saved_icon = None
+        self.undo_button = None
+        self.redo_button = None
+        self.prediction_text = None
         self.field_map = {}
         self.__create_components()
+        self.model.on_written(self._on_written)
 
     def __create_components(self):
-        for k, v in self.model.fields.items():
-            label = k.replace("_", " ").title()
-            self.field_map[label] = k
-            if k == "overall_score":
-                self.slider = self._slider(v)
-            elif isinstance(v, np.bool_):
-                icon = ICONS.get(k, ft.icons.NOT_STARTED_SHARP)
-                self.tiles.append(
-                    self.tile(
-                        label,
-                        icon,
-                        v,
-                    )
-                )
-            elif isinstance(v, np.int8):
-                self.radios.append(self.radio_group(label, str(v)))
-            elif isinstance(v, np.float16):
-                self.text_fields.append(self.text_field(label, str(v)))
-            elif not isinstance(v, date):
-                self.logger.error(f"Invalid type of field {k}: {type(v)}")
+        # widgets are generated from the field registry in `schema.yaml`
+        values = self.model.fields
+        for field in SCHEMA:
+            v = values[field.name]
+            self.field_map[field.label] = field.name
+            if field.widget == "slider":
+                self.slider = self._slider(v, field.min, field.max)
+            elif field.widget == "tile":
+                icon = getattr(ft.icons, field.icon or "", ft.icons.NOT_STARTED_SHARP)
+                self.tiles.append(self.tile(field.label, icon, v))
+            elif field.widget == "radio":
+                self.radios.append(self.radio_group(field.label, str(v), field.options))
+            elif field.widget == "text":
+                self.text_fields.append(self.text_field(field.label, str(v)))
+            elif field.widget != "header":
+                self.logger.error(f"Unknown widget of field {field.name}: {field.widget}")
 
     def input_fields_container(self, content=None):
         return ft.Container(
@@ -62,7 +58,7 @@ class MainView(UserControl):
             # bgcolor=Colors.DEBUG.value,
         )
 
-    def radio_group(self, label: str, value: str):
+    def radio_group(self, label: str, value: str, options=(0, 1, 2)):
 
         return ft.Column(
             controls=[
@@ -74,23 +70,15 @@ class MainView(UserControl):
                 ),
                 ft.RadioGroup(
                     value=value,
+                    on_change=self._on_form_change,
                     content=ft.Row(
                         [
                             ft.Radio(
-                                value="0",
-                                label="0",
-                                fill_color=Colors.EXTRA2.value,
-                            ),
-                            ft.Radio(
-                                value="1",
-                                label="1",
-                                fill_color=Colors.EXTRA2.value,
-                            ),
-                            ft.Radio(
-                                value="2",
-                                label="2",
+                                value=str(option),
+                                label=str(option),
                                 fill_color=Colors.EXTRA2.value,
-                            ),
+                            )
+                            for option in options
                         ],
                         alignment="center",
                     ),
@@ -108,6 +96,7 @@ class MainView(UserControl):
             border_color=Colors.EXTRA2.value,
             cursor_color=Colors.EXTRA2.value,
             width=CONFIG.window_width // 4,
+            on_change=self._on_form_change,
         )
 
     def _on_tile_click(self, e):
@@ -117,6 +106,7 @@ class MainView(UserControl):
         else:
             e.control.bgcolor = Colors.THIRD.value
         e.control.update()
+        self._on_form_change(e)
 
     def tile(self, label: str, icon: ft.Icon, value: int = 0) -> ft.Container:
         return ft.Container(
@@ -147,23 +137,6 @@ class MainView(UserControl):
 
     @property
     def input_row(self):
-        self.work_time_field = self.text_field("work hours", self.model.work_time)
-        self.study_time_field = self.text_field("study hours", self.model.study_time)
-        self.sleep_time_field = self.text_field("sleep hours", self.model.sleep_time)
-        self.alcohol = self.radio_group("alcohol", value=self.model.alcohol)
-        self.bad_habbits_radio = self.radio_group(
-            "bad habbits", value=self.model.bad_habits
-        )
-        self.energy_drinks_radio = self.radio_group(
-            "energy drinks", value=self.model.energy_drinks
-        )
-        self.gym_tile = self.tile("Gym", ft.icons.FITNESS_CENTER, self.model.gym)
-        self.chess_tile = self.tile(
-            "Chess tasks", ft.icons.CHURCH, self.model.chess_tasks
-        )
-        self.code_tile = self.tile("Code task", ft.icons.CODE, self.model.code_tasks)
-        self.fast_food = self.tile("Fast food", ft.icons.EGG_ALT, self.model.fast_food)
-
         return ft.Row(
             controls=[
                 self.input_fields_container(
@@ -195,8 +168,18 @@ class MainView(UserControl):
         self.model.go_to_next_day()
         self.update_all(e)
 
+    def _date_label(self) -> str:
+        # the model keeps datetime64 timestamps, the header shows a plain date
+        day = self.model.date.date()
+        return f"{day} {'(today)' if day == datetime.now().date() else ''}"
+
     @property
     def header(self):
+        self.date_text = ft.Text(
+            self._date_label(),
+            style=ft.TextThemeStyle.TITLE_LARGE,
+            color=Colors.EXTRA2.value,
+        )
         return ft.Container(
             content=ft.Row(
                 [
@@ -206,11 +189,7 @@ class MainView(UserControl):
                         on_click=self._go_day_back,
                         icon_size=40,
                     ),
-                    ft.Text(
-                        f"{self.model.date} {'(today)' if self.model.date == datetime.now().date() else ''}",
-                        style=ft.TextThemeStyle.TITLE_LARGE,
-                        color=Colors.EXTRA2.value,
-                    ),
+                    self.date_text,
                     ft.IconButton(
                         icon=ft.icons.ARROW_FORWARD_OUTLINED,
                         icon_color=Colors.EXTRA2.value,
@@ -229,25 +208,53 @@ class MainView(UserControl):
     @property
     def footer(self):
         global SAVED
+        self.saved_icon = ft.IconButton(
+            icon=ft.icons.DONE_ALL,
+            icon_color=Colors.EXTRA.value,
+            icon_size=40,
+            opacity=self._saved_opacity(),
+            # disabled=True,
+        )
+        self.undo_button = ft.IconButton(
+            icon=ft.icons.UNDO,
+            icon_color=Colors.EXTRA2.value,
+            tooltip="Undo",
+            on_click=self._on_undo_click,
+            disabled=not self.model.can_undo,
+        )
+        self.redo_button = ft.IconButton(
+            icon=ft.icons.REDO,
+            icon_color=Colors.EXTRA2.value,
+            tooltip="Redo",
+            on_click=self._on_redo_click,
+            disabled=not self.model.can_redo,
+        )
         return ft.Container(
             ft.Row(
                 controls=[
-                    ft.ElevatedButton(
-                        "Reset",
-                        color=Colors.SECONDARY.value,
-                        bgcolor=Colors.THIRD.value,
-                        on_click=self._on_reset_button_click,
-                        icon=ft.icons.REPLAY,
-                    ),
-                    ft.IconButton(
-                        icon=ft.icons.DONE_ALL,
-                        icon_color=Colors.EXTRA.value,
-                        icon_size=40,
-                        opacity=float(SAVED),
-                        # disabled=True,
+                    ft.Row(
+                        [
+                            ft.ElevatedButton(
+                                "Reset",
+                                color=Colors.SECONDARY.value,
+                                bgcolor=Colors.THIRD.value,
+                                on_click=self._on_reset_button_click,
+                                icon=ft.icons.REPLAY,
+                            ),
+                            self.undo_button,
+                            self.redo_button,
+                        ],
                     ),
+                    self.saved_icon,
                     ft.Row(
                         [
+                            ft.ElevatedButton(
+                                "Grid",
+                                color=Colors.SECONDARY.value,
+                                bgcolor=Colors.PRIMARY.value,
+                                icon=ft.icons.GRID_VIEW,
+                                on_click=self._on_grid_click,
+                            ),
                             ft.ElevatedButton(
                                 "Stats",
                                 color=Colors.SECONDARY.value,
@@ -274,8 +281,11 @@ class MainView(UserControl):
     def _on_stats_click(self, e: ft.Event):
         e.control.page.go("/statistics")
 
-    def _on_save_click(self, e):
-        global SAVED
+    def _on_grid_click(self, e: ft.Event):
+        e.control.page.go("/grid")
+
+    def _form_values(self) -> dict:
+        """Values currently entered in the form, by field name."""
         dict_data = {}
         for tile in self.tiles:
             name = tile.content.controls[0].value
@@ -290,25 +300,80 @@ class MainView(UserControl):
             key = self.field_map[radio.controls[0].value]
             dict_data[key] = value
         dict_data["overall_score"] = self.slider.value
+        return dict_data
+
+    def _prediction_label(self) -> str:
+        values = self._form_values()
+        score = min(max(self.model.predict_score(values), self.slider.min), self.slider.max)
+        drivers = self.model.score_drivers().head(3)
+        names = ", ".join(
+            f"{name.replace('_', ' ')} {'+' if effect >= 0 else '-'}"
+            for name, effect in drivers.items()
+            if effect != 0
+        )
+        return f"Predicted score: {score:.1f}" + (f"   (driven by {names})" if names else "")
+
+    def _on_form_change(self, e) -> None:
+        self.prediction_text.value = self._prediction_label()
+        if self.prediction_text.page is not None:
+            self.prediction_text.update()
+
+    def _on_save_click(self, e):
+        global SAVED
+        dict_data = self._form_values()
         self.logger.info(f"Saving data: {dict_data}")
-        self.controller.save_data(dict_data)
+        try:
+            self.controller.save_data(dict_data)
+        except ValidationError as exc:
+            # the entered values stay in the form, so they can be corrected
+            SAVED = False
+            self._show_errors(exc, e.page)
+            return
         SAVED = True
         self.update_all(e)
 
+    def _show_errors(self, error: ValidationError, page: ft.Page) -> None:
+        """Marks the text fields breaking a rule and lists every broken rule in a snack bar."""
+        for field in self.text_fields:
+            messages = error.messages(self.field_map[field.label])
+            field.error_text = "; ".join(messages) if messages else None
+        self.saved_icon.opacity = self._saved_opacity()
+        self.update()
+        if page is not None:
+            page.snack_bar = ft.SnackBar(
+                ft.Text("Not saved: " + "; ".join(error.messages()), color=Colors.SECONDARY.value),
+                bgcolor=Colors.EXTRA2.value,
+            )
+            page.snack_bar.open = True
+            page.update()
+
     def _on_reset_button_click(self, e):
         global SAVED
         self.controller.reset_values()
         SAVED = False
         self.update_all(e)
 
-    def _slider(self, value):
+    def _on_undo_click(self, e):
+        global SAVED
+        # undo may go to another day, like the arrows
+        SAVED = False
+        self.controller.undo()
+        self.update_all(e)
+
+    def _on_redo_click(self, e):
+        global SAVED
+        SAVED = False
+        self.controller.redo()
+        self.update_all(e)
+
+    def _slider(self, value, min=0, max=5):
         return ft.Slider(
             thumb_color=Colors.EXTRA.value,
             active_color=Colors.EXTRA.value,
             inactive_color=Colors.EXTRA2.value,
-            min=0,
-            max=5,
-            divisions=5,
+            min=min,
+            max=max,
+            divisions=int(max - min),
             value=float(value),
             on_change=self._on_slider_change,
             label="overall score: {value}",
@@ -316,10 +381,11 @@ class MainView(UserControl):
 
     @property
     def slider_container(self):
+        self.prediction_text = ft.Text(self._prediction_label(), color=Colors.EXTRA2.value)
         return ft.Container(
             alignment=ft.alignment.center,
             content=ft.Column(
-                [ft.Text("Overall score"), self.slider],
+                [ft.Text("Overall score"), self.slider, self.prediction_text],
                 # horizontal_alignment="center",
             ),
             margin=5,
@@ -350,8 +416,40 @@ class MainView(UserControl):
             event.control.border_radius = 12
             event.control.update()
 
+    def refresh(self) -> None:
+        """Rebinds the existing controls to the current values of the model."""
+        fields = self.model.fields
+        for tile in self.tiles:
+            value = bool(fields[self.field_map[tile.content.controls[0].value]])
+            tile.data = value
+            tile.bgcolor = Colors.EXTRA.value if value else Colors.THIRD.value
+        for field in self.text_fields:
+            value = str(fields[self.field_map[field.label]])
+            field.value = value if float(value) != 0 else None
+            field.error_text = None
+        for radio in self.radios:
+            radio.controls[1].value = str(fields[self.field_map[radio.controls[0].value]])
+        self.slider.value = float(fields["overall_score"])
+        self.date_text.value = self._date_label()
+        self.prediction_text.value = self._prediction_label()
+        self.saved_icon.opacity = self._saved_opacity()
+        self.undo_button.disabled = not self.model.can_undo
+        self.redo_button.disabled = not self.model.can_redo
+
+    def _saved_opacity(self) -> float:
+        # faded while the save is still waiting for the background writer
+        if not SAVED:
+            return 0.0
+        return 1.0 if self.model.saved else 0.4
+
+    def _on_written(self) -> None:
+        # called from the writer thread once the saves are on disk
+        if self.saved_icon is None or self.saved_icon.page is None:
+            return
+        self.saved_icon.opacity = self._saved_opacity()
+        self.saved_icon.update()
+
     def update_all(self, event: ft.Event):
-        page = event.page
-        page.controls.pop()
-        page.controls.append(MainView(self.model, self.controller, self.logger))
-        page.update()
+        # flet sends only the properties that changed since the last update
+        self.refresh()
+        self.update()
@@ -0,0 +1,158 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from logging import Logger
+from dataclasses import dataclass
+from schema import SCHEMA
+
+
+@dataclass(frozen=True)
+class Rename:
+    """Renames column `old` to `new`, converting its values with `convert` if given."""
+
+    old: str
+    new: str
+    convert: object = None
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.old not in df.columns:
+            return df
+        df = df.rename(columns={self.old: self.new})
+        if self.convert is not None:
+            df[self.new] = self.convert(df[self.new])
+        return df
+
+
+@dataclass(frozen=True)
+class Drop:
+    """Removes `column`, which is no longer tracked."""
+
+    column: str
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.drop(columns=self.column, errors="ignore")
+
+
+def _was_eaten(values: pd.Series) -> pd.Series:
+    # `mc_donalds` counted meals (-1 not filled in), `fast_food` only tracks if there was any
+    return pd.to_numeric(values, errors="coerce").fillna(-1) > 0
+
+
+def _party_to_alcohol(values: pd.Series) -> pd.Series:
+    # `party` only told if there was one: a party counts as level 1, any other day
+    # says nothing about alcohol and stays not filled in (-1)
+    flags = values.astype(str).str.strip().str.lower()
+    partied = (flags == "true") | (flags == "1")
+    return pd.Series(np.where(partied, 1, -1), index=values.index, dtype=np.int8)
+
+
+# steps from the first released layout (`OLD_comfort_data.csv`) to the current schema,
+# columns of the schema missing after the steps get their default value
+LEGACY_STEPS = (
+    Rename("mc_donalds", "fast_food", _was_eaten),
+    Rename("party", "alcohol", _party_to_alcohol),
+    # weekday name written after the last column, without a header
+    Drop("unnamed_12"),
+)
+
+
+def read_columns(source: Path) -> list:
+    """Returns the header of `source`, extended with `unnamed_<position>` for
+    values of the first row that have no header."""
+    with open(source, newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        first_row = next(reader, header)
+    extra = range(len(header), len(first_row))
+    return [*header, *(f"unnamed_{i}" for i in extra)]
+
+
+def migrate(
+    source: Path,
+    target: Path,
+    logger: Logger,
+    steps: tuple = LEGACY_STEPS,
+    chunk_size: int = 10_000,
+) -> int:
+    """
+    Streams `source` in chunks of `chunk_size` rows through `steps` and writes it in the
+    current schema to `target`. For dates stored more than once the last row wins.
+    Memory use depends on the chunk size and the number of distinct days, not on the file size:
+    the first pass reads only the dates to find the last row of every day,
+    the second pass converts and writes those rows. Returns the number of rows written.
+
+    Args:
+        `source`: Legacy csv file.
+        `target`: Path of the migrated csv file, replaced only once the migration finished.
+        `logger`: Logger for this function.
+        `steps`: Migration steps, objects with `apply(df) -> df`, applied in order.
+        `chunk_size`: Number of rows read at once.
+    """
+    source, target = Path(source), Path(target)
+    columns = read_columns(source)
+    last_rows = {}
+    for start, chunk in _chunks(source, columns, chunk_size, usecols=["date"]):
+        dates = pd.to_datetime(chunk["date"]).dt.normalize()
+        last_rows.update(zip(dates, range(start, start + len(chunk))))
+    keep = np.sort(np.fromiter(last_rows.values(), dtype=np.int64, count=len(last_rows)))
+    logger.info(f"Migrating {len(keep)} days from {source} to {target}")
+
+    tmp_path = target.with_name(target.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    rows = 0
+    for start, chunk in _chunks(source, columns, chunk_size):
+        chunk = chunk[np.isin(np.arange(start, start + len(chunk)), keep)]
+        chunk = chunk.assign(date=pd.to_datetime(chunk["date"]).dt.normalize())
+        for step in steps:
+            chunk = step.apply(chunk)
+        chunk = SCHEMA.cast(_complete(chunk, logger))
+        chunk.to_csv(tmp_path, mode="a", header=not tmp_path.exists(), index=False)
+        rows += len(chunk)
+    if not tmp_path.exists():
+        pd.DataFrame(columns=SCHEMA.names).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, target)
+    logger.info(f"Migrated {rows} rows to {target}")
+    return rows
+
+
+def _chunks(source: Path, columns: list, chunk_size: int, usecols: list = None):
+    """Yields `(position of the first row, chunk)` of `source`."""
+    start = 0
+    reader = pd.read_csv(
+        source,
+        names=columns,
+        header=None,
+        skiprows=1,
+        usecols=usecols,
+        chunksize=chunk_size,
+    )
+    with reader:
+        for chunk in reader:
+            yield start, chunk
+            start += len(chunk)
+
+
+def _complete(df: pd.DataFrame, logger: Logger) -> pd.DataFrame:
+    """Adds the schema columns missing in `df` with their defaults."""
+    unknown = [c for c in df.columns if c not in SCHEMA.names]
+    if unknown:
+        logger.warning(f"Columns {unknown} are not in the schema, they are dropped.")
+    for field in SCHEMA:
+        if field.name not in df.columns:
+            df[field.name] = field.default
+    return df[SCHEMA.names]
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Migrate a legacy history to the current schema.")
+    parser.add_argument("source", type=Path)
+    parser.add_argument("target", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrate(args.source, args.target, logging.getLogger("migration"), chunk_size=args.chunk_size)
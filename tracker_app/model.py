@@ -1,30 +1,78 @@
 import datetime
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from dataclasses import dataclass
 from logging import Logger
-import numpy as np
+from storage import CsvStorage, open_storage
+from aggregates import Aggregates
+from habits import Habits
+from correlations import Correlations
+from predictor import ScorePredictor
+from day_cache import DayCache
+from writer import BackgroundWriter
+from history import Change, EditHistory
+from tracker_state import TrackerState, checksum, totals
+from schema import SCHEMA
+from validation import VALIDATOR, ValidationError
 
 """
 TODO 
-1. Add validation rules for each field.
-2. Add github actions for testing.
+1. Add github actions for testing.
 """
 
-FIELDS = {
-    "date": ("datetime64", datetime.datetime.now().date()),
-    "work_time": (np.float16, 0.0),
-    "study_time": (np.float16, 0.0),
-    "sleep_time": (np.float16, 0.0),
-    "chess_tasks": (np.bool_, False),
-    "code_tasks": (np.bool_, False),
-    "fast_food": (np.bool_, False),
-    "gym": (np.bool_, False),
-    "alcohol": (np.int8, -1),
-    "energy_drinks": (np.int8, -1),
-    "bad_habits": (np.int8, -1),
-    "overall_score": (np.int8, 0),
-}
+# `{name: (type, default)}` of every tracked field, compiled from `schema.yaml`
+FIELDS = SCHEMA.as_fields_dict()
+
+
+class DayRecord:
+    """
+    Values of one day. Values are cast to their `FIELDS` type on assignment,
+    slots instead of a `__dict__` keep records small and cheap to copy.
+    `date` is stored as a midnight `pd.Timestamp` and comes last, as in the data file.
+    """
+
+    __slots__ = (*(field for field in FIELDS if field != "date"), "date")
+
+    def __init__(self, **values) -> None:
+        self.reset()
+        self.date = values.pop("date", pd.Timestamp.today())
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    def __setattr__(self, name: str, value) -> None:
+        if name == "date":
+            value = pd.Timestamp(value).normalize()
+        else:
+            value = FIELDS[name][0](value)
+        object.__setattr__(self, name, value)
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DayRecord) and self.values() == other.values()
+
+    def __repr__(self) -> str:
+        return f"DayRecord({self.as_dict()})"
+
+    def reset(self) -> None:
+        """Sets every field except `date` to its default value."""
+        for field in self.__slots__[:-1]:
+            setattr(self, field, FIELDS[field][1])
+
+    def copy(self) -> "DayRecord":
+        record = DayRecord.__new__(DayRecord)
+        for field in self.__slots__:
+            object.__setattr__(record, field, getattr(self, field))
+        return record
+
+    def values(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.__slots__, self.values()))
 
 
 @dataclass
@@ -32,93 +80,636 @@ class Model:
     """
     Model for the comfort tracker app. Here all fields are defined and the data is loaded and saved.
     If todey's data is already in the data file, the initial values are set to the last row.
-    Model has set of validation rules for each field. If the validation fails,
-    the field will be set to the default value.
-    (For now works only for the fields that are set in the init method.)
+    Model has set of validation rules for each field (see `validation.py`). A value that can not
+    be cast is set to the default value, a day breaking a rule is not saved.
 
     Args:
         `_data_path` (private attribute): Path to the data file. If it does not exist, it will be created.
         `_logger` (private attribute): Logger for this class.
-        `_data` (private attribute): Data loaded from the data file. It is a private attribute.
+        `_record` (private attribute): Values of the current day. They are also available
+            as attributes of the model (e.g. `model.sleep_time`).
+        `_frame` (private attribute): Stored days sorted by date, loaded from the data file.
+        `_new_days` (private attribute): Days saved for the first time, by date. They are merged
+            into `_frame` with one sort when the sorted data is read next, so saving a new day
+            costs the same at any history length. `_data` is `_frame` with them merged.
+        `_loaded_from` (private attribute): First day of `_frame`, `None` if it holds the whole
+            history. Storages reading only the recent months (`PartitionedStorage`) set it,
+            older days are read the first time something needs them.
+        `_storage` (private attribute): Storage engine for the data file. Picked by the suffix
+            of `_data_path`: `SqliteStorage` for `.db`/`.sqlite` files, `PartitionedStorage` (one file
+            per month) for `.parts` directories, otherwise `JournalStorage`, which appends each save
+            to a journal instead of rewriting the file.
+        `_version` (private attribute): Bumped on every save, see `version`.
+        `_stats` (private attribute): Running aggregates of the data, see `stats`.
+        `_habits` (private attribute): Streaks and counter frequencies of the data, see `habits`.
+        `_correlations` (private attribute): Lagged correlations between the fields, see `correlations`.
+        `_tracker_state` (private attribute): `_stats`, `_habits` and `_correlations` saved on `close`
+            (`<data file>.trackers.pkl`) and restored on start while the data did not change.
+        `_trackers_changed` (private attribute): `True` if the trackers (or the predictor) changed
+            since they were saved.
+        `_predictor` (private attribute): Online model of `overall_score`, see `predict_score`.
+            Its state is kept next to the data file (`<data file>.predictor.npz`).
+        `_days` (private attribute): Decoded fields of the days around `date`, used by navigation.
+        `_writer` (private attribute): Writes saved days to `_storage` in a background thread.
+        `_save_delay` (private attribute): Seconds the writer waits for more saves before writing.
+        `_history` (private attribute): Changes of the stored days since the start, see `undo`.
+            Every change is also appended to `<data file>.history.jsonl`.
+        `_discarded` (private attribute): Unsaved values of the current day dropped by `reset_values`.
 
     methods:
-        `save`: Saves the data to the data file.
+        `save`: Saves the current day. It is written to the data file in the background, see `flush`.
+        `reset_values`: Sets the current day to the default values, `undo` brings them back.
+        `undo`, `redo`: Revert and repeat saved changes.
+        `flush`: Waits until every saved day is written.
+        `close`: Flushes and closes the data file.
         `update`: Updates the data with the current values.
+        `upsert_many`: Saves many days at once with a single write.
+        `range`: Returns the stored days between two dates.
+        `column`: Returns the stored values of one field between two dates as a numpy view.
+        `rolling`: Returns a calendar window aggregate of one field for every stored day.
         `change_date`: Changes the date of the entry.
         `__str__`: Returns representation of the model.
     """
 
     _logger: Logger = None
     _data_path: Path = Path("comfort_data.csv")
-    _data: pd.DataFrame = None
+    _frame: pd.DataFrame = None
+    _new_days: dict = None
+    _loaded_from: pd.Timestamp = None
+    _storage: CsvStorage = None
+    _version: int = 0
+    _stats: Aggregates = None
+    _habits: Habits = None
+    _correlations: Correlations = None
+    _tracker_state: TrackerState = None
+    _trackers_changed: bool = False
+    _predictor: ScorePredictor = None
+    _days: DayCache = None
+    _record: DayRecord = None
+    _writer: BackgroundWriter = None
+    _save_delay: float = 0.5
+    _history: EditHistory = None
+    _discarded: DayRecord = None
+
+    AGGREGATIONS = ("mean", "sum", "count", "std")
 
     def __post_init__(self):
         global FIELDS
-        # set fields as class attributes
-        self.set_default_values()
-        self.__setattr__("date", datetime.datetime.now().date())
-        self._data = self.__load_data(self._data_path)
+        self._record = DayRecord()
+        # guards `_frame` and `_new_days` against the day cache and the writer reading them
+        # in the background
+        self._lock = threading.RLock()
+        if self._storage is None:
+            self._storage = open_storage(self._data_path, self._logger)
+        self._frame = self.__load_data(self._data_path)
+        self._loaded_from = self._storage.loaded_from
+        self._new_days = {}
+        self._history = EditHistory()
+        self._tracker_state = TrackerState(self.tracker_state_path, self._logger)
+        self.__load_trackers()
+        self._predictor = self.__load_predictor()
+        self._days = DayCache(self.__read_day, self._logger)
+        self._writer = BackgroundWriter(self.__write, self._logger, self._save_delay)
         self.__set_initial_values()
+        self._days.prefetch(self.date)
+
+    @property
+    def _data(self) -> pd.DataFrame:
+        """Loaded days sorted by date, `_new_days` are merged in first."""
+        with self._lock:
+            self.__merge()
+            return self._frame
+
+    def __getattr__(self, name: str):
+        # only called when normal lookup fails, i.e. for the fields of the current day
+        if name in DayRecord.__slots__:
+            return getattr(self._record, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __setattr__(self, name: str, value) -> None:
+        if name in DayRecord.__slots__:
+            setattr(self._record, name, value)
+        else:
+            object.__setattr__(self, name, value)
 
     def set_default_values(self) -> None:
-        global FIELDS
-        for field, (field_type, default_value) in FIELDS.items():
-            if field != "date":
-                v = field_type(default_value)
-                self.__setattr__(field, v)
+        self._record.reset()
+
+    def reset_values(self) -> None:
+        """Sets the current day to the default values, the unsaved values are kept for `undo`."""
+        self._discarded = self._record.copy()
+        self._record.reset()
 
     def set_values(self, data: dict) -> None:
         for k, v in data.items():
             try:
-                v = FIELDS[k][0](v)
+                setattr(self._record, k, v)
             except ValueError:
-                v = FIELDS[k][1]
-            self.__setattr__(k, v)
+                self._logger.warning(f"Invalid value {v!r} for {k}. Using the default value.")
+                setattr(self._record, k, FIELDS[k][1])
+
+    def save_values(self, values: dict) -> None:
+        """Sets `values` and saves the current day. If the day breaks a rule,
+        `ValidationError` is raised and the current values stay as they were."""
+        previous = self._record.copy()
+        self.set_values(values)
+        try:
+            self.save()
+        except ValidationError:
+            self._record = previous
+            raise
 
     def save(self) -> None:
+        old = self.__read_day(self.date)
         self.update()
-        self._logger.info(f"Saving data to {self._data_path}")
-        self._data.to_csv(self._data_path, index=False)
+        record = self._record.copy()
+        change = Change.between(record.date, old and old.as_dict(), record.as_dict())
+        # the writer thread takes the new entries for the audit log under the lock
+        with self._lock:
+            if change is not None:
+                self._history.record([change], lambda: self._data)
+        self._discarded = None
+        # quick repeated saves of a day are merged and written once
+        self._writer.submit(record.date, (record.date, record))
+
+    @property
+    def history(self) -> EditHistory:
+        """Changes of the stored days since the start, see `data_at`."""
+        return self._history
+
+    def data_at(self, version: int) -> pd.DataFrame:
+        """Rebuilds the stored data as it was after the first `version` changes of `history`,
+        versions before `history.oldest` are no longer kept."""
+        self.__ensure_loaded(None)
+        with self._lock:
+            return self._history.at(version, self._data)
+
+    @property
+    def can_undo(self) -> bool:
+        return self._discarded is not None or self._history.can_undo
+
+    @property
+    def can_redo(self) -> bool:
+        return self._history.can_redo
+
+    def undo(self) -> bool:
+        """Brings back the values dropped by `reset_values`, otherwise reverts the last saved
+        change and goes to its day. Returns `False` if there is nothing to undo."""
+        if self._discarded is not None:
+            self._record, self._discarded = self._discarded, None
+            return True
+        with self._lock:
+            changes = self._history.undo(self.__apply, lambda: self._data)
+        return self.__replay(changes)
+
+    def redo(self) -> bool:
+        """Repeats the last undone change and goes to its day. Returns `False` if there is nothing to redo."""
+        with self._lock:
+            changes = self._history.redo(self.__apply, lambda: self._data)
+        return self.__replay(changes)
+
+    def __apply(self, change: Change) -> None:
+        """Applies an undo or redo `change` to the data."""
+        with self._lock:
+            if change.after is None:
+                self.__delete(change.date)
+            else:
+                record = self.__read_day(change.date) or DayRecord(date=change.date)
+                for field, value in change.after.items():
+                    setattr(record, field, value)
+                self.__upsert(record)
+
+    def __replay(self, changes: list) -> bool:
+        if not changes:
+            return False
+        for date in {change.date for change in changes}:
+            record = self.__read_day(date)
+            # a day without a record is removed from the data file
+            self._writer.submit(date, (date, record))
+            self._days.put(date, record)
+        self._version += 1
+        self.__change_date(min(change.date for change in changes))
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Writes the pending saves now and waits for them. Returns `False` on timeout."""
+        return self._writer.flush(timeout)
+
+    def close(self, timeout: float = None) -> None:
+        """Writes the pending saves and stops the background threads."""
+        self._days.close(timeout)
+        self._writer.close(timeout)
+        self.__save_trackers()
+        self._storage.close()
+
+    @property
+    def saved(self) -> bool:
+        """`True` if every saved day is written to the data file."""
+        return self._writer.idle and not self._writer.failed
+
+    def on_written(self, listener) -> None:
+        """Calls `listener()` from the writer thread after saved days were written."""
+        self._writer.add_listener(listener)
+
+    @property
+    def stats(self) -> Aggregates:
+        """Per weekday, per score and per month aggregates of the stored data."""
+        return self._stats
+
+    @property
+    def habits(self) -> Habits:
+        """Current and longest streaks of the habits and frequencies of the counters."""
+        return self._habits
+
+    @property
+    def correlations(self) -> Correlations:
+        """Correlations between the fields at lags of 0-3 days."""
+        return self._correlations
+
+    @property
+    def predictor_path(self) -> Path:
+        return self._data_path.with_name(self._data_path.name + ".predictor.npz")
+
+    @property
+    def tracker_state_path(self) -> Path:
+        return self._data_path.with_name(self._data_path.name + ".trackers.pkl")
+
+    def predict_score(self, values: dict = None) -> float:
+        """Predicted `overall_score` of the current day, with `values` (e.g. the unsaved form)
+        applied on top. Empty values and values that can not be cast are ignored."""
+        record = self._record.copy()
+        for k, v in (values or {}).items():
+            if v is None or v == "":
+                continue
+            try:
+                setattr(record, k, v)
+            except (ValueError, TypeError):
+                pass
+        return self._predictor.predict(record)
+
+    def score_drivers(self) -> pd.Series:
+        """Effect of one standard deviation of every field on the predicted score, largest first."""
+        return self._predictor.importance()
+
+    @property
+    def version(self) -> int:
+        """Version of the stored data, changes on every save. Used to invalidate cached charts."""
+        return self._version
 
     def update(self) -> None:
-        self._data = self._data[self._data["date"] != self.date]
-        # sort by date
-        self._data = pd.concat(
-            [
-                self._data,
-                pd.DataFrame(self.fields, index=[0]),
-            ],
-            ignore_index=True,
+        """Puts the current values into the in-memory data, `save` also writes them."""
+        # only the changed day is checked, the stored rows were checked on load
+        self.__check_rules(pd.DataFrame([self.fields]))
+        with self._lock:
+            self.__upsert(self._record)
+        # navigation and cached charts have to see the new values
+        self._days.put(self.date, self._record.copy())
+        self._version += 1
+
+    def upsert_many(self, records: list) -> None:
+        """Saves many days at once, e.g. a backfilled week. The batch is validated in one vectorized
+        pass and rejected as a whole if a day breaks a rule. Stored days are overwritten column by
+        column, new days are merged in with a single sort, and the batch reaches the data file
+        in one write. `undo` reverts the whole batch.
+        Args:
+            `records`: `DayRecord`s or dicts of values with a `date`, missing fields get their
+                default value. The last record of a date wins.
+        """
+        records = {
+            record.date: record
+            for record in (
+                r.copy() if isinstance(r, DayRecord) else DayRecord(**r) for r in records
+            )
+        }
+        if not records:
+            return
+        batch = pd.DataFrame([record.as_dict() for record in records.values()])
+        self.__check_rules(batch)
+        batch = self.__validate_fields(batch)
+        with self._lock:
+            self.__ensure_loaded(batch["date"].min())
+            self.__merge()
+            old = {date: self.__read_day(date) for date in records}
+            dates = self._frame["date"].to_numpy()
+            wanted = batch["date"].to_numpy()
+            positions = dates.searchsorted(wanted)
+            stored = positions < len(dates)
+            stored[stored] = dates[positions[stored]] == wanted[stored]
+            rows = positions[stored]
+            for pos in rows:
+                self.__track(self._frame.iloc[pos], -1)
+            for field in batch.columns.drop("date"):
+                col = self._frame.columns.get_loc(field)
+                self._frame.iloc[rows, col] = batch[field].to_numpy()[stored]
+            if not stored.all():
+                self._frame = (
+                    pd.concat([self._frame, batch[~stored]], ignore_index=True)
+                    .sort_values(by="date", kind="stable")
+                    .reset_index(drop=True)
+                )
+            for record in records.values():
+                self.__track(record, 1)
+            changes = [
+                Change.between(date, old[date] and old[date].as_dict(), record.as_dict())
+                for date, record in records.items()
+            ]
+            changes = [change for change in changes if change is not None]
+            if changes:
+                self._history.record(changes, lambda: self._frame)
+        for date, record in records.items():
+            self._days.put(date, record)
+        # one batch for the writer, the days are written together
+        self._writer.submit_many({date: (date, record) for date, record in records.items()})
+        self._version += 1
+        if self.date in records:
+            self.__set_initial_values()
+
+    def __upsert(self, record: DayRecord) -> None:
+        self.__ensure_loaded(record.date)
+        old = self._new_days.get(record.date)
+        if old is not None:
+            # saved for the first time a moment ago, still waiting to be merged
+            self.__track(old, -1)
+            self._new_days[record.date] = record.copy()
+            self.__track(record, 1)
+            return
+        pos = self.__position(record.date)
+        if pos is not None:
+            # the day is already stored, overwrite its row in place
+            self.__track(self._frame.iloc[pos], -1)
+            for field, (field_type, default_value) in FIELDS.items():
+                if field != "date":
+                    col = self._frame.columns.get_loc(field)
+                    self._frame.iat[pos, col] = field_type(record[field])
+            self.__track(record, 1)
+            return
+        # new days wait next to the frame, no row has to move now
+        self._new_days[record.date] = record.copy()
+        self.__track(record, 1)
+
+    def __delete(self, date: pd.Timestamp) -> None:
+        self.__ensure_loaded(date)
+        old = self._new_days.pop(date, None)
+        if old is not None:
+            self.__track(old, -1)
+            return
+        pos = self.__position(date)
+        if pos is None:
+            return
+        self.__track(self._frame.iloc[pos], -1)
+        self._frame = self._frame.drop(index=pos).reset_index(drop=True)
+
+    def __position(self, date: pd.Timestamp) -> int:
+        """Row of `date` in `_frame`, `None` if it is not there."""
+        dates = self._frame["date"].to_numpy()
+        date = np.datetime64(date, "ns")
+        pos = int(dates.searchsorted(date))
+        if pos < len(dates) and dates[pos] == date:
+            return pos
+        return None
+
+    def __ensure_loaded(self, start) -> None:
+        """Reads the days from the month of `start` on (the whole history if `start` is `None`)
+        that are not in memory yet."""
+        if start is not None:
+            start = pd.Timestamp(start).normalize().replace(day=1)
+        with self._lock:
+            if self._loaded_from is None or (start is not None and start >= self._loaded_from):
+                return
+            older = self._storage.read_range(start, self._loaded_from - pd.Timedelta(days=1))
+            older = self.__validate_fields(older)
+            self._logger.debug(f"Read {len(older)} days before {self._loaded_from:%Y-%m-%d}.")
+            # older days were never changed, the trackers already count them
+            self._frame = pd.concat([older, self._frame], ignore_index=True)
+            self._history.prepend(older)
+            self._loaded_from = start
+
+    def __merge(self) -> None:
+        """Puts `_new_days` into `_frame` with a single sort."""
+        if not self._new_days:
+            return
+        rows = self.__validate_fields(
+            pd.DataFrame([record.as_dict() for record in self._new_days.values()])
         )
-        # set types for each column
-        self.__validate_fields()
-        self._data["date"] = pd.to_datetime(self._data["date"]).dt.date
-        self._data = self._data.sort_values(by="date")
+        self._frame = (
+            pd.concat([self._frame, rows], ignore_index=True)
+            .sort_values(by="date", kind="stable")
+            .reset_index(drop=True)
+        )
+        self._new_days = {}
+
+    def __track(self, row, sign: int) -> None:
+        """Adds (`sign` 1) or removes (`sign` -1) a day from the running statistics."""
+        self._trackers_changed = True
+        for tracker in (self._stats, self._habits, self._correlations, self._predictor):
+            if sign > 0:
+                tracker.add(row)
+            else:
+                tracker.remove(row)
+
+    def range(self, start=None, end=None, fields: list = None) -> pd.DataFrame:
+        """Returns the days with `start <= date <= end`, sorted by date.
+        The in-memory data answers, it already holds the saves still waiting for the writer.
+        Args:
+            `start`, `end`: Bounds of the range, `None` leaves the side open.
+            `fields`: Columns to return next to `date`. All by default.
+        """
+        self.__ensure_loaded(start)
+        data = self._data
+        lo, hi = self.__bounds(data, start, end)
+        if fields is None:
+            # a row slice shares the memory of `_data`, it must not be modified
+            return data.iloc[lo:hi]
+        return data.iloc[lo:hi][["date", *fields]]
+
+    def column(self, field: str, start=None, end=None) -> np.ndarray:
+        """Returns the stored values of `field` with `start <= date <= end`, sorted by date.
+        The array is a read-only view of the in-memory history, nothing is copied."""
+        self.__ensure_loaded(start)
+        data = self._data
+        lo, hi = self.__bounds(data, start, end)
+        values = data[field].to_numpy()[lo:hi]
+        values.flags.writeable = False
+        return values
+
+    def rolling(self, field: str, window: int, agg: str = "mean", start=None, end=None) -> tuple:
+        """Returns `(dates, values)` of the stored days with `start <= date <= end`, where `values`
+        aggregates `field` over the days stored in the `window` calendar days ending at each date.
+        Windows are cut from cumulative sums, so any window size costs the same.
+        Args:
+            `field`: Field to aggregate.
+            `window`: Window size in days, e.g. 7, 30 or 90.
+            `agg`: One of `AGGREGATIONS`.
+            `start`, `end`: Bounds of the returned days, windows still reach back before `start`.
+        """
+        if agg not in self.AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {agg}. Should be one of {self.AGGREGATIONS}.")
+        self.__ensure_loaded(None if start is None else pd.Timestamp(start) - pd.Timedelta(days=window))
+        data = self._data
+        lo, hi = self.__bounds(data, start, end)
+        dates = data["date"].to_numpy()
+        first = np.searchsorted(dates, dates[lo:hi] - np.timedelta64(window - 1, "D"), "left")
+        last = np.arange(lo + 1, hi + 1)
+        count = (last - first).astype(float)
+        if agg == "count":
+            return dates[lo:hi], count
+        values = data[field].to_numpy(dtype=float)
+        sums = np.concatenate(([0.0], np.cumsum(values)))
+        total = sums[last] - sums[first]
+        if agg == "sum":
+            return dates[lo:hi], total
+        mean = total / count
+        if agg == "mean":
+            return dates[lo:hi], mean
+        squares = np.concatenate(([0.0], np.cumsum(values**2)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = (squares[last] - squares[first] - count * mean**2) / (count - 1)
+        return dates[lo:hi], np.sqrt(np.clip(variance, 0, None))
+
+    def __bounds(self, data: pd.DataFrame, start, end) -> tuple:
+        """Returns the row positions `lo:hi` of the days of `data` with `start <= date <= end`."""
+        dates = data["date"]
+        lo = 0 if start is None else int(dates.searchsorted(pd.Timestamp(start), "left"))
+        hi = len(dates) if end is None else int(dates.searchsorted(pd.Timestamp(end), "right"))
+        return lo, hi
 
     @property
     def fields(self) -> dict:
-        fields = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
-        return fields
+        return self._record.as_dict()
 
-    def __validate_fields(self) -> bool:
-        global FIELDS
-        for field, (field_type, default_value) in FIELDS.items():
-            try:
-                self._data[field] = self._data[field].astype(field_type)
-            except ValueError as exc:
-                self._logger.error(
-                    f"Invalid value for {field}. Should be {field_type}. "
-                )
-                raise exc
+    def __validate_fields(self, df: pd.DataFrame) -> pd.DataFrame:
+        try:
+            return SCHEMA.cast(df)
+        except ValueError as exc:
+            self._logger.error(str(exc))
+            raise exc
 
-    def __set_initial_values(self) -> None:
+    @property
+    def history_path(self) -> Path:
+        return self._data_path.with_name(self._data_path.name + ".history.jsonl")
+
+    def __write(self, days: list) -> None:
+        """Writes `(date, record)` pairs, a day without a record is removed."""
+        with self._lock:
+            predictor = self._predictor.snapshot()
+            changes = self._history.unwritten()
+        if changes:
+            self.__log_changes(changes)
+        saved = [record.as_dict() for date, record in days if record is not None]
+        deleted = [date for date, record in days if record is None]
+        if saved:
+            self._storage.save_many(self.__snapshot, saved)
+        if deleted:
+            self._storage.delete_many(self.__snapshot, deleted)
         try:
-            row = (
-                self._data[self._data["date"] == self.date]
-                .reset_index(drop=True)
-                .iloc[-1]
-            )
-        except IndexError:
+            predictor.save(self.predictor_path)
+        except OSError as exc:
+            # only costs a retraining on the next start
+            self._logger.warning(f"Could not save the score predictor: {exc}")
+
+    def __snapshot(self) -> pd.DataFrame:
+        """Consistent copy of the history, for the storages rewriting the whole file."""
+        with self._lock:
+            return self._data.copy()
+
+    def __log_changes(self, changes: list) -> None:
+        try:
+            with open(self.history_path, "a") as file:
+                file.writelines(change.to_json() + "\n" for change in changes)
+        except OSError as exc:
+            # the data file matters more than its audit trail
+            self._logger.warning(f"Could not append to the edit history: {exc}")
+
+    def __load_trackers(self) -> None:
+        """Restores the trackers saved on the last `close`, builds them from the loaded data
+        if there are none or the data changed since."""
+        fields = [field for field in FIELDS if field != "date"]
+        total = self.__checksum(fields)
+        trackers = None if total is None else self._tracker_state.load(fields, total)
+        self._trackers_changed = trackers is None
+        if trackers is None:
+            # built from the whole history
+            self.__ensure_loaded(None)
+            trackers = {
+                "stats": Aggregates.from_frame(self._frame, fields),
+                "habits": Habits.from_frame(self._frame),
+                "correlations": Correlations.from_frame(self._frame, fields),
+            }
+        self._stats = trackers["stats"]
+        self._habits = trackers["habits"]
+        self._correlations = trackers["correlations"]
+
+    def __save_trackers(self) -> None:
+        with self._lock:
+            if not self._trackers_changed:
+                return
+            if self._loaded_from is not None and not self.saved:
+                # the checksum comes from the storage, it has to hold every saved day
+                return
+            fields = [field for field in FIELDS if field != "date"]
+            trackers = {
+                "stats": self._stats,
+                "habits": self._habits,
+                # held as arrays, much smaller to pickle than the per day dict
+                "correlations": self._correlations.snapshot(),
+            }
+            self._tracker_state.save(fields, self.__checksum(fields), trackers)
+            # the writer only saves the predictor with written days
+            self._predictor.save(self.predictor_path)
+            self._trackers_changed = False
+
+    def __checksum(self, fields: list) -> np.ndarray:
+        """`checksum` of the whole stored history, `None` if the storage can not tell it."""
+        if self._loaded_from is None:
+            return checksum(self._data, fields)
+        # the older months are not in memory, the storage adds up the checksums of its partitions
+        return self._storage.checksum(fields)
+
+    def __trained_on_history(self, predictor: ScorePredictor) -> bool:
+        if self._loaded_from is None:
+            return predictor.matches(self._frame)
+        fields = [field for field in FIELDS if field != "date"]
+        total = self.__checksum(fields)
+        if total is None:
+            return False
+        return predictor.matches_totals(
+            *totals(total, fields, [*predictor.fields, predictor.target])
+        )
+
+    def __load_predictor(self) -> ScorePredictor:
+        fields = [field for field in FIELDS if field not in ("date", "overall_score")]
+        predictor = ScorePredictor.load(self.predictor_path, fields)
+        if predictor is not None and self.__trained_on_history(predictor):
+            return predictor
+        self.__ensure_loaded(None)
+        self._trackers_changed = True
+        self._logger.info(f"Training the score predictor on {len(self._frame)} days.")
+        return ScorePredictor.from_frame(self._frame, fields)
+
+    def __check_rules(self, df: pd.DataFrame) -> None:
+        report = VALIDATOR.check(df)
+        if not report:
+            days = ", ".join(str(date.date()) for date in df["date"].iloc[report.rows])
+            msg = f"Day(s) {days} break validation rules:\n{report}"
+            self._logger.error(msg)
+            raise ValidationError(msg, report)
+
+    def __read_day(self, date: pd.Timestamp) -> DayRecord:
+        """Returns the stored record of `date`, or `None` if there is no row from this date."""
+        self.__ensure_loaded(date)
+        with self._lock:
+            record = self._new_days.get(date)
+            if record is not None:
+                return record.copy()
+            pos = self.__position(date)
+            if pos is None:
+                return None
+            row = self._frame.iloc[pos]
+        return DayRecord(**row)
+
+    def __set_initial_values(self) -> None:
+        record = self._days.get(self.date)
+        if record is None:
             self._logger.info(f"No data from {self.date}. Setting initial values.")
             self.set_default_values()
             # reset values to 0
@@ -126,27 +717,22 @@ class Model:
         self._logger.info(
             f"Found row with data from {self.date} . Setting initial values."
         )
-        for k in self.fields.keys():
-            if k != "date":
-                row[k] = FIELDS[k][0](row[k])
-                setattr(self, k, row[k])
+        # the cached record stays untouched by edits of the current day
+        self._record = record.copy()
 
     def __load_data(self, data_path: Path) -> pd.DataFrame:
-        if not data_path.exists():
-            self._logger.warning(f"File {data_path} does not exist. Creating it.")
-            df = pd.DataFrame(columns=self.fields.keys())
-            df.to_csv(data_path, index=False)
-            self._logger.info(f"Created file with header {df.head(0).columns}")
-        else:
-            self._logger.debug(f"File {data_path} exists. Loading it.")
-            df = pd.read_csv(data_path)
-            # set dtype of date to date
-            df["date"] = pd.to_datetime(df["date"]).dt.date
-            if tuple(map(str, self.fields.keys())) != tuple(df.columns):
-                msg = f"File {data_path} has different columns than expected. Expected: \n{list(self.fields.keys())}\nGOT: \n{list(df.columns)}"
-                self._logger.error(msg)
-                raise ValueError(msg)
-        return df
+        df = self._storage.load(list(self.fields.keys()))
+        if tuple(map(str, self.fields.keys())) != tuple(df.columns):
+            msg = f"File {data_path} has different columns than expected. Expected: \n{list(self.fields.keys())}\nGOT: \n{list(df.columns)}\nOld files can be converted with `python migration.py <old file> <new file>`."
+            self._logger.error(msg)
+            raise ValueError(msg)
+        df = self.__validate_fields(df)
+        report = VALIDATOR.check(df)
+        if not report:
+            # old rows are kept as they are, they are only rejected when saved again
+            self._logger.warning(f"{len(report.rows)} stored rows break validation rules:\n{report}")
+        # `update` relies on the rows being sorted by date
+        return df.sort_values(by="date", kind="stable").reset_index(drop=True)
 
     def __change_date(self, date: datetime.date) -> None:
         """Changes the date and sets the initial values to the  row from this date if exists.
@@ -156,16 +742,21 @@ class Model:
         self._logger.debug(
             f"Changing date to {date} ({type(date)}). Setting initial values."
         )
-        self.date = datetime.datetime.strptime(str(date), "%Y-%m-%d").date()
+        # dates are kept as midnight timestamps, the same as the datetime64 `date` column
+        date = pd.Timestamp(date).normalize()
+        direction = 1 if date >= self.date else -1
+        self.date = date
+        self._discarded = None
         self.__set_initial_values()
-        # make sure that the date is a datetime.date
+        # keep reading the days ahead in the direction of travel
+        self._days.prefetch(self.date, direction)
 
-    def go_to_next_day(self) -> datetime.date:
+    def go_to_next_day(self) -> pd.Timestamp:
         """Changes the date to the next day and sets the initial values to the  row from this date if exists."""
         self.__change_date(self.date + datetime.timedelta(days=1))
         return self.date
 
-    def go_to_previous_day(self) -> datetime.date:
+    def go_to_previous_day(self) -> pd.Timestamp:
         self.__change_date(self.date - datetime.timedelta(days=1))
         return self.date
 
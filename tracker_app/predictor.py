@@ -0,0 +1,138 @@
+import os
+import copy
+import zipfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+class ScorePredictor:
+    """
+    Linear model of `target` from the other fields, trained online with recursive least squares.
+    Every stored day is one sample: `add` and `remove` update the weights and the inverse
+    information matrix with a rank one (Sherman-Morrison) step, O(features²) per saved day,
+    so editing a day never refits the history. The result equals ridge regression
+    over all stored days with a penalty of `1 / prior`.
+
+    Args:
+        `fields`: Fields used as features.
+        `target`: Field to predict.
+        `prior`: Initial variance of the weights, the larger the weaker the regularization.
+    """
+
+    def __init__(self, fields: list, target: str = "overall_score", prior: float = 100.0) -> None:
+        self.fields = list(fields)
+        self.target = target
+        self.prior = prior
+        size = len(self.fields) + 1
+        # the last weight is the intercept
+        self.weights = np.zeros(size)
+        self.covariance = np.eye(size) * prior
+        self.count = 0
+        # sums and squares of the features and the target, for `importance` and `matches`
+        self.sums = np.zeros(size)
+        self.squares = np.zeros(size)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fields: list, **kwargs) -> "ScorePredictor":
+        """Fits all rows of `df` at once, the same result as adding them one by one."""
+        predictor = cls(fields, **kwargs)
+        features = np.column_stack(
+            [df[predictor.fields].to_numpy(dtype=float), np.ones(len(df))]
+        )
+        target = df[predictor.target].to_numpy(dtype=float)
+        information = np.eye(features.shape[1]) / predictor.prior + features.T @ features
+        predictor.covariance = np.linalg.inv(information)
+        predictor.weights = predictor.covariance @ (features.T @ target)
+        predictor.count = len(df)
+        observed = np.column_stack([features[:, :-1], target])
+        predictor.sums = observed.sum(axis=0)
+        predictor.squares = (observed**2).sum(axis=0)
+        return predictor
+
+    def add(self, row: dict) -> None:
+        self.__update(row, 1)
+
+    def remove(self, row: dict) -> None:
+        self.__update(row, -1)
+
+    def predict(self, row: dict) -> float:
+        return float(self.__features(row) @ self.weights)
+
+    def importance(self) -> pd.Series:
+        """Change of the prediction for one standard deviation of every field, largest first."""
+        if self.count < 2:
+            return pd.Series(0.0, index=self.fields)
+        mean = self.sums[:-1] / self.count
+        variance = np.clip(self.squares[:-1] / self.count - mean**2, 0, None)
+        effect = pd.Series(self.weights[:-1] * np.sqrt(variance), index=self.fields)
+        return effect.reindex(effect.abs().sort_values(ascending=False).index)
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """`True` if the predictor was trained on exactly the rows of `df` (checked by their sums)."""
+        if self.count != len(df):
+            return False
+        observed = df[[*self.fields, self.target]].to_numpy(dtype=float)
+        return self.matches_totals(len(df), observed.sum(axis=0), (observed**2).sum(axis=0))
+
+    def matches_totals(self, count: int, sums: np.ndarray, squares: np.ndarray) -> bool:
+        """`matches` for rows known only by their number and the sums and squares
+        of `fields` and `target`."""
+        return (
+            self.count == count
+            and np.allclose(self.sums, sums)
+            and np.allclose(self.squares, squares)
+        )
+
+    def snapshot(self) -> "ScorePredictor":
+        """Copy of the current state. Updates replace the arrays instead of changing them
+        in place, so the copy shares them and costs O(1)."""
+        return copy.copy(self)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            np.savez(
+                file,
+                fields=np.array([*self.fields, self.target], dtype=str),
+                prior=self.prior,
+                weights=self.weights,
+                covariance=self.covariance,
+                count=self.count,
+                sums=self.sums,
+                squares=self.squares,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, fields: list, target: str = "overall_score") -> "ScorePredictor":
+        """Returns the predictor saved at `path`, or `None` if there is none for these fields."""
+        try:
+            with np.load(path, allow_pickle=False) as state:
+                if list(state["fields"]) != [*fields, target]:
+                    return None
+                predictor = cls(fields, target, float(state["prior"]))
+                predictor.weights = state["weights"]
+                predictor.covariance = state["covariance"]
+                predictor.count = int(state["count"])
+                predictor.sums = state["sums"]
+                predictor.squares = state["squares"]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        return predictor
+
+    def __features(self, row: dict) -> np.ndarray:
+        return np.array([*(float(row[field]) for field in self.fields), 1.0])
+
+    def __update(self, row: dict, sign: int) -> None:
+        features = self.__features(row)
+        target = float(row[self.target])
+        projected = self.covariance @ features
+        gain = sign * projected / (1 + sign * features @ projected)
+        self.weights = self.weights + gain * (target - features @ self.weights)
+        self.covariance = self.covariance - np.outer(gain, projected)
+        self.count += sign
+        observed = np.append(features[:-1], target)
+        self.sums = self.sums + sign * observed
+        self.squares = self.squares + sign * observed**2
@@ -1,3 +1,4 @@
+import os
 import PyInstaller.__main__
 from pathlib import Path
 
@@ -11,6 +12,9 @@ PyInstaller.__main__.run(
         "--noconsole",
         "--icon=comfort_tracker.ico",
         "--hidden-import=matplotlib.backends.backend_svg",
+        "--hidden-import=matplotlib.backends.backend_agg",
+        # the field registry is read at import time of `schema`
+        f"--add-data={Path(__file__).parent / 'schema.yaml'}{os.pathsep}.",
         "--icon=comfort_tracker.ico",
         # change dir to the project root
         f"--distpath={str(app_folder.resolve())}",
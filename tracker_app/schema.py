@@ -0,0 +1,124 @@
+import yaml
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dataclasses import dataclass, field
+
+SCHEMA_PATH = Path(__file__).parent / "schema.yaml"
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    One tracked field, see `schema.yaml`.
+
+    Args:
+        `name`: Column name in the data file.
+        `dtype`: Numpy dtype of the column.
+        `default`: Value of a day without data.
+        `widget`: How the field is shown in `MainView`.
+        `label`: Text shown next to the widget.
+        `icon`: Name of the flet icon of a tile.
+        `options`: Values of a radio group.
+        `min`, `max`: Valid range of the value, also the bounds of a slider.
+        `habit`: For boolean habits, `done` if keeping it means `True`, `avoided` if `False`.
+    """
+
+    name: str
+    dtype: np.dtype
+    default: object = None
+    widget: str = "text"
+    label: str = None
+    icon: str = None
+    options: tuple = ()
+    min: float = None
+    max: float = None
+    habit: str = None
+
+    @property
+    def type(self):
+        """Callable casting a single value to the field type (`astype` argument for dates)."""
+        return str(self.dtype) if self.dtype.kind == "M" else self.dtype.type
+
+
+@dataclass(frozen=True)
+class Schema:
+    """
+    Registry of the tracked fields. It compiles to a numpy structured dtype,
+    so whole frames are validated and cast in one conversion.
+
+    Args:
+        `fields`: Fields in the column order of the data file.
+        `rules`: `{name: spec}` of the rules between fields, see `validation.Validator`.
+    """
+
+    fields: tuple = field(default_factory=tuple)
+    rules: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_yaml(cls, path: Path = SCHEMA_PATH) -> "Schema":
+        with open(path) as file:
+            spec = yaml.safe_load(file)
+        fields = []
+        for name, options in spec["fields"].items():
+            options = dict(options)
+            dtype = np.dtype(options.pop("type"))
+            default = options.pop("default", None)
+            if dtype.kind == "M":
+                default = pd.Timestamp.today().normalize()
+            fields.append(
+                Field(
+                    name=name,
+                    dtype=dtype,
+                    default=dtype.type(default) if dtype.kind != "M" else default,
+                    label=options.pop("label", name.replace("_", " ").title()),
+                    options=tuple(options.pop("options", ())),
+                    **options,
+                )
+            )
+        return cls(tuple(fields), spec.get("rules") or {})
+
+    @property
+    def names(self) -> list:
+        return [f.name for f in self.fields]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype([(f.name, f.dtype) for f in self.fields])
+
+    def __getitem__(self, name: str) -> Field:
+        for f in self.fields:
+            if f.name == name:
+                return f
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def as_fields_dict(self) -> dict:
+        """The schema in the `{name: (type, default)}` form of `model.FIELDS`."""
+        return {f.name: (f.type, f.default) for f in self.fields}
+
+    def cast(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Returns `df` with the schema columns, in schema order, cast to their dtypes.
+        Raises `ValueError` naming the first field that can not be cast."""
+        # numpy would silently turn missing values into garbage integers
+        exact = [f.name for f in self.fields if f.dtype.kind in "biu"]
+        missing = df[exact].isna().any()
+        if missing.any():
+            raise ValueError(f"Missing values for {list(missing[missing].index)}.")
+        records = df[self.names].to_records(index=False)
+        try:
+            return pd.DataFrame(records.astype(self.dtype), index=df.index)
+        except (ValueError, TypeError):
+            pass
+        # find the culprit only after the fast path failed
+        for f in self.fields:
+            try:
+                df[f.name].to_numpy().astype(f.dtype)
+            except (ValueError, TypeError) as exc:
+                raise ValueError(f"Invalid value for {f.name}. Should be {f.dtype}.") from exc
+        raise ValueError(f"Could not cast data to {self.dtype}")
+
+
+SCHEMA = Schema.from_yaml()
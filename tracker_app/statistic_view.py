@@ -3,43 +3,62 @@ from utils import CONFIG, Colors
 import flet as ft
 from model import Model
 from controller import Controller
-import matplotlib.pyplot as plt
-from flet.matplotlib_chart import MatplotlibChart
-import seaborn as sns
-import pandas as pd
+import base64
+import charts
+import downsample
+from charts import ChartCache
+from concurrent.futures import Future
 from logging import Logger
 
-# change plt style
-sns.set_style("dark")
-plt.tight_layout()
-sns.set(
-    rc={
-        # "axes.facecolor": Colors.SECONDARY.value,
-        "figure.facecolor": Colors.WHITE.value,
-        # "figure.edgecolor": Colors.SECONDARY.value,
-        # "axes.grid": False,
-        "axes.spines.right": False,
-        "axes.spines.left": False,
-        "axes.spines.top": False,
-        "axes.spines.bottom": False,
-    }
-)
-
 
 class StatisticView(UserControl):
     def __init__(self, model: Model, controller: Controller, logger: Logger):
         super().__init__()
         self.charts_iter = self.charts_iterator()
+        self.chart_cache = ChartCache()
+        # charts are drawn off the ui thread, one worker shows, the other prefetches
+        self.executor = charts.process_pool(max_workers=2)
         self.logger = logger
         self.model = model
         self.controller = controller
 
+    @property
+    def chart_names(self) -> list:
+        return [attr for attr in self.__class__.__dict__ if attr.endswith("_chart")]
+
     def charts_iterator(self):
+        """Yields names of the `*_chart` properties in a loop."""
         while True:
-            for attr in self.__class__.__dict__:
-                if attr.endswith("_chart"):
-                    self.logger.debug(f"Found chart: {attr}")
-                    yield getattr(self, attr)
+            for attr in self.chart_names:
+                self.logger.debug(f"Found chart: {attr}")
+                yield attr
+
+    def close(self) -> None:
+        """Stops the rendering processes, charts not started yet are dropped."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def chart(self, name: str, size: tuple) -> Future:
+        """Returns a future of the png bytes of chart `name`.
+        It is rendered again only if the data changed since."""
+
+        def submit():
+            plot, data = getattr(self, name)
+            return self.executor.submit(charts.render, plot, data, size)
+
+        return self.chart_cache.get(name, self.model.version, size, submit)
+
+    def _chart_image(self, future: Future) -> ft.Control:
+        try:
+            png = future.result()
+        except Exception as exc:
+            self.logger.error(f"Could not render chart: {exc!r}")
+            return ft.Text("Could not render chart", color=Colors.SECONDARY.value)
+        return ft.Image(src_base64=base64.b64encode(png).decode(), fit="contain")
+
+    def _on_chart_rendered(self, container: ft.Container, future: Future) -> None:
+        container.content = self._chart_image(future)
+        if container.page is not None:
+            container.update()
 
     def close_button(self, opacity=0.5):
         return ft.IconButton(
@@ -82,13 +101,25 @@ class StatisticView(UserControl):
 
     @property
     def chart_container(self):
-        return ft.Container(
-            width=CONFIG.window_width / 1.3,
-            height=CONFIG.window_height / 1.2,
+        size = (CONFIG.window_width / 1.3, CONFIG.window_height / 1.2)
+        container = ft.Container(
+            width=size[0],
+            height=size[1],
             bgcolor=Colors.WHITE.value,
-            content=next(self.charts_iter),
+            content=ft.ProgressRing(),
+            alignment=ft.alignment.center,
             border_radius=10,
         )
+        name = next(self.charts_iter)
+        future = self.chart(name, size)
+        # render the chart behind the right arrow while this one is looked at
+        names = self.chart_names
+        self.chart(names[(names.index(name) + 1) % len(names)], size)
+        if future.done():
+            container.content = self._chart_image(future)
+        else:
+            future.add_done_callback(lambda f: self._on_chart_rendered(container, f))
+        return container
 
     @property
     def view(self):
@@ -115,25 +146,39 @@ class StatisticView(UserControl):
 
     @property
     def sleep_time_per_weekday_chart(self):
-        fig, ax = plt.subplots()
-        df = self.model._data.copy()
-        df["weekday"] = df["date"].apply(lambda x: pd.to_datetime(x).day_name())
-        avg_sleep_time = df.groupby("weekday")["sleep_time"].mean()
-        ax = sns.barplot(x=avg_sleep_time.index, y=avg_sleep_time.values)
-        ax.set(xlabel="Weekday", ylabel="Sleep time")
-        ax.set_title("Sleep time per weekday", fontsize=20)
-        plt.tight_layout()
-        # set size of chart
-
-        return MatplotlibChart(fig, expand=True)
+        return charts.sleep_time_per_weekday, self.model.stats.table("weekday", "sleep_time")
 
     @property
     def score_vs_sleep_time_chart(self):
-        fig, ax = plt.subplots()
-        ax = sns.barplot(x="overall_score", y="sleep_time", data=self.model._data)
-        ax.set_title("Sleep time vs overarall score", fontsize=20)
-        plt.tight_layout()
-        return MatplotlibChart(fig, expand=True)
+        table = self.model.stats.table("overall_score", "sleep_time")
+        return charts.score_vs_sleep_time, table
+
+    @property
+    def habit_streaks_chart(self):
+        return charts.habit_streaks, self.model.habits.streak_table()
+
+    @property
+    def counter_frequency_chart(self):
+        return charts.counter_frequency, self.model.habits.frequency_table()
+
+    @property
+    def score_correlations_chart(self):
+        # the worker gets a copy, the live object changes with every save
+        return charts.score_correlations, self.model.correlations.snapshot()
+
+    def _trend(self, field: str):
+        # the point budget follows the chart width, not the length of the history
+        width = CONFIG.window_width / 1.3
+        frame = downsample.series(field, self.model.column("date"), self.model.column(field), width)
+        return charts.trend, frame
+
+    @property
+    def sleep_time_trend_chart(self):
+        return self._trend("sleep_time")
+
+    @property
+    def overall_score_trend_chart(self):
+        return self._trend("overall_score")
 
     def _on_right_arrow_click(self, e: ft.Event):
         view = self.build()
@@ -0,0 +1,604 @@
+import io
+import os
+import json
+import datetime
+import hashlib
+import sqlite3
+import zipfile
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from logging import Logger
+import tracker_state
+
+
+def open_storage(data_path: Path, logger: Logger):
+    """Picks the storage engine by the suffix of `data_path`: sqlite for `.db`/`.sqlite`,
+    one file per month for `.parts` directories, journal csv otherwise."""
+    if Path(data_path).suffix in SqliteStorage.SUFFIXES:
+        return SqliteStorage(data_path, logger)
+    if Path(data_path).suffix in PartitionedStorage.SUFFIXES:
+        return PartitionedStorage(data_path, logger)
+    return JournalStorage(data_path, logger)
+
+
+class CsvStorage:
+    """
+    Keeps the whole history in a single csv file. Every save rewrites the file.
+    Next to the csv a binary snapshot (`<data_path>.snapshot.npz`) of the parsed columns is kept.
+    It is tagged with the mtime, size and hash of the csv, and used on load instead of parsing
+    the text as long as they all match.
+
+    Args:
+        `data_path`: Path to the csv file. If it does not exist, it will be created.
+        `logger`: Logger for this class.
+    """
+
+    supports_ranges = False
+    # first day returned by `load`, `None` if it returns the whole history
+    loaded_from = None
+
+    def __init__(self, data_path: Path, logger: Logger) -> None:
+        self.data_path = Path(data_path)
+        self._logger = logger
+
+    def load(self, columns: list) -> pd.DataFrame:
+        if not self.data_path.exists():
+            self._logger.warning(f"File {self.data_path} does not exist. Creating it.")
+            df = pd.DataFrame(columns=columns)
+            df.to_csv(self.data_path, index=False)
+            self._logger.info(f"Created file with header {df.head(0).columns}")
+            return df
+        self._logger.debug(f"File {self.data_path} exists. Loading it.")
+        content = self.data_path.read_bytes()
+        df = self.__load_snapshot(content)
+        if df is None:
+            df = pd.read_csv(self.data_path)
+            if "date" in df.columns:
+                df["date"] = pd.to_datetime(df["date"])
+            self.__write_snapshot(df, content)
+        return df
+
+    def save(self, snapshot, record: dict) -> None:
+        self.save_many(snapshot, [record])
+
+    def save_many(self, snapshot, records: list) -> None:
+        """Stores `records`. `snapshot()` returns a copy of the whole history including them,
+        it is only called by storages rewriting the whole file."""
+        self._logger.info(f"Saving data to {self.data_path}")
+        self._write_base(snapshot())
+
+    def delete_many(self, snapshot, dates: list) -> None:
+        """Removes the days of `dates`, `snapshot()` returns the whole history without them."""
+        self._logger.info(f"Removing {len(dates)} day(s) from {self.data_path}")
+        self._write_base(snapshot())
+
+    def close(self) -> None:
+        pass
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.data_path.with_name(self.data_path.name + ".snapshot.npz")
+
+    def _write_base(self, data: pd.DataFrame) -> None:
+        # write next to the target and swap, so a crash never leaves a half written file
+        content = data.to_csv(index=False).encode()
+        tmp_path = self.data_path.with_name(self.data_path.name + ".tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, self.data_path)
+        self.__write_snapshot(data, content)
+
+    def __signature(self, content: bytes) -> np.ndarray:
+        stat = self.data_path.stat()
+        digest = hashlib.sha256(content).digest()
+        return np.array([stat.st_mtime_ns, stat.st_size, *np.frombuffer(digest, np.int64)])
+
+    def __load_snapshot(self, content: bytes) -> pd.DataFrame:
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as snapshot:
+                if not np.array_equal(snapshot["signature"], self.__signature(content)):
+                    self._logger.debug(f"Snapshot of {self.data_path} is stale.")
+                    return None
+                columns = snapshot["columns"]
+                df = pd.DataFrame({c: snapshot[f"column_{i}"] for i, c in enumerate(columns)})
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as exc:
+            self._logger.warning(f"Could not read snapshot of {self.data_path}: {exc}")
+            return None
+        self._logger.debug(f"Loaded {self.data_path} from snapshot.")
+        return df
+
+    def __write_snapshot(self, df: pd.DataFrame, content: bytes) -> None:
+        arrays = {f"column_{i}": df[c].to_numpy() for i, c in enumerate(df.columns)}
+        if any(array.dtype == object for array in arrays.values()):
+            # object columns can not be stored without pickle
+            self._logger.debug(f"Skipping snapshot of {self.data_path}, it has object columns.")
+            return
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as file:
+                np.savez(
+                    file,
+                    signature=self.__signature(content),
+                    columns=np.array(df.columns, dtype=str),
+                    **arrays,
+                )
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as exc:
+            self._logger.warning(f"Could not write snapshot of {self.data_path}: {exc}")
+            tmp_path.unlink(missing_ok=True)
+
+
+class JournalStorage(CsvStorage):
+    """
+    Csv storage that appends every save as one upsert record to a journal file
+    (`<data_path>.journal`) instead of rewriting the whole history.
+    On load the journal is replayed on top of the base file, the last record for a date wins.
+    Every batch is appended with a single synced write, so a crash can only tear the last line.
+    A torn line is skipped on load and cut off before the next append.
+    When the journal grows past `compact_threshold` bytes, the base file is rewritten
+    in a background thread and the journal is dropped.
+
+    Args:
+        `data_path`: Path to the base csv file.
+        `logger`: Logger for this class.
+        `compact_threshold`: Journal size in bytes that triggers compaction.
+    """
+
+    def __init__(
+        self, data_path: Path, logger: Logger, compact_threshold: int = 64 * 1024
+    ) -> None:
+        super().__init__(data_path, logger)
+        self.compact_threshold = compact_threshold
+        self.journal_path = self.data_path.with_name(self.data_path.name + ".journal")
+        # journal frozen for the running compaction, new records go to a fresh journal
+        self.compacting_path = self.journal_path.with_name(
+            self.journal_path.name + ".compacting"
+        )
+        self._lock = threading.Lock()
+        self._compaction: threading.Thread = None
+
+    def load(self, columns: list) -> pd.DataFrame:
+        df = super().load(columns)
+        journals = [
+            journal
+            for journal in map(self.__read_journal, (self.compacting_path, self.journal_path))
+            if journal is not None
+        ]
+        if not journals:
+            return df
+        self._logger.debug(f"Replaying {len(journals)} journal file(s) on {self.data_path}")
+        df = pd.concat([df, *journals], ignore_index=True)
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.drop_duplicates(subset="date", keep="last")
+        return df.sort_values(by="date", kind="stable").reset_index(drop=True)
+
+    def save_many(self, snapshot, records: list) -> None:
+        self._logger.info(f"Appending {len(records)} record(s) to {self.journal_path}")
+        with self._lock:
+            with open(self.journal_path, "ab+") as file:
+                size = self.__drop_torn_line(file)
+                content = pd.DataFrame(records).to_csv(
+                    index=False, header=size == 0, lineterminator="\n"
+                )
+                self.__append(file, content.encode())
+                size = file.tell()
+        if size >= self.compact_threshold:
+            self.compact(snapshot())
+
+    def delete_many(self, snapshot, dates: list) -> None:
+        """The journal only holds upserts, so removing days rewrites the base file
+        and drops the journal."""
+        self._logger.info(f"Removing {len(dates)} day(s) from {self.data_path}")
+        self.close()
+        data = snapshot()
+        with self._lock:
+            self._write_base(data)
+            self.journal_path.unlink(missing_ok=True)
+            self.compacting_path.unlink(missing_ok=True)
+
+    def compact(self, data: pd.DataFrame) -> None:
+        """Rewrites the base file from `data` in a background thread and drops the journal.
+        `data` has to contain every record written to the journal so far."""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            if not self.journal_path.exists():
+                return
+            if self.compacting_path.exists():
+                # left by a crashed compaction, it may hold the only copy of its records
+                self.__merge_journal()
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+            self._compaction = threading.Thread(
+                target=self.__compact, args=(data.copy(),), daemon=True
+            )
+        self._logger.info(f"Compacting journal into {self.data_path}")
+        self._compaction.start()
+
+    def __compact(self, data: pd.DataFrame) -> None:
+        try:
+            self._write_base(data)
+        except OSError as exc:
+            # the frozen journal stays on disk and is replayed on the next load
+            self._logger.error(f"Compaction of {self.data_path} failed: {exc}")
+            return
+        self.compacting_path.unlink(missing_ok=True)
+        self._logger.debug(f"Compaction of {self.data_path} finished")
+
+    def close(self) -> None:
+        """Waits for a running compaction to finish."""
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def __read_journal(self, path: Path) -> pd.DataFrame:
+        """Complete records of a journal file, `None` if it has none."""
+        if not path.exists():
+            return None
+        content = path.read_bytes()
+        # a line without a newline was torn by a crash
+        content = content[: content.rfind(b"\n") + 1]
+        if not content:
+            return None
+        df = pd.read_csv(io.BytesIO(content), on_bad_lines="skip")
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        broken = df["date"].isna()
+        if broken.any():
+            self._logger.warning(f"Skipping {broken.sum()} broken record(s) in {path}")
+        return df[~broken]
+
+    def __merge_journal(self) -> None:
+        """Appends the records of the journal to the frozen journal and drops the journal."""
+        self._logger.warning(f"Merging {self.journal_path} into {self.compacting_path}")
+        content = self.journal_path.read_bytes()
+        # without the header and a torn last line
+        content = content[content.find(b"\n") + 1 : content.rfind(b"\n") + 1]
+        with open(self.compacting_path, "ab+") as file:
+            self.__drop_torn_line(file)
+            self.__append(file, content)
+        self.journal_path.unlink()
+
+    @staticmethod
+    def __append(file, content: bytes) -> None:
+        # one write, on disk before the save counts as written
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+
+    @staticmethod
+    def __drop_torn_line(file) -> int:
+        """Cuts a line torn by a crash off the end of `file`. Returns the size of the file."""
+        size = file.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        file.seek(-1, os.SEEK_END)
+        if file.read(1) == b"\n":
+            return size
+        file.seek(0)
+        size = file.read().rfind(b"\n") + 1
+        file.truncate(size)
+        return size
+
+
+class SqliteStorage:
+    """
+    Keeps the history in a sqlite database (WAL mode) with `date` as the primary key.
+    Saving a day upserts a single row, range queries are answered by sqlite.
+    If the database is new and a csv file with the same name exists next to it,
+    the csv is imported once.
+
+    Args:
+        `data_path`: Path to the database file. If it does not exist, it will be created.
+        `logger`: Logger for this class.
+    """
+
+    SUFFIXES = (".db", ".sqlite")
+    TABLE = "entries"
+    supports_ranges = True
+    loaded_from = None
+
+    def __init__(self, data_path: Path, logger: Logger) -> None:
+        self.data_path = Path(data_path)
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._created = not self.data_path.exists()
+        self._connection = sqlite3.connect(self.data_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._columns: list = None
+
+    def load(self, columns: list) -> pd.DataFrame:
+        self.__create_table(columns)
+        csv_path = self.data_path.with_suffix(".csv")
+        if self._created and csv_path.exists():
+            self.import_csv(csv_path)
+        self._logger.debug(f"Loading {self.data_path}")
+        return self.read_range()
+
+    def save(self, snapshot, record: dict) -> None:
+        self.save_many(snapshot, [record])
+
+    def save_many(self, snapshot, records: list) -> None:
+        self._logger.info(f"Upserting {len(records)} record(s) to {self.data_path}")
+        self.upsert(records)
+
+    def upsert(self, records: list) -> None:
+        columns = ", ".join(f'"{c}"' for c in self._columns)
+        placeholders = ", ".join("?" for _ in self._columns)
+        updates = ", ".join(
+            f'"{c}" = excluded."{c}"' for c in self._columns if c != "date"
+        )
+        query = (
+            f"INSERT INTO {self.TABLE} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(date) DO UPDATE SET {updates}"
+        )
+        rows = [[self.__to_sql(r[c]) for c in self._columns] for r in records]
+        with self._lock, self._connection:
+            self._connection.executemany(query, rows)
+
+    def delete_many(self, snapshot, dates: list) -> None:
+        self._logger.info(f"Removing {len(dates)} day(s) from {self.data_path}")
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"DELETE FROM {self.TABLE} WHERE date = ?",
+                [(self.__to_sql(date),) for date in dates],
+            )
+
+    def read_range(self, start=None, end=None, fields: list = None) -> pd.DataFrame:
+        """Returns rows with `start <= date <= end` sorted by date. Missing bounds are open."""
+        fields = self._columns if fields is None else ["date", *fields]
+        columns = ", ".join(f'"{c}"' for c in dict.fromkeys(fields))
+        query = f"SELECT {columns} FROM {self.TABLE} WHERE date >= ? AND date <= ? ORDER BY date"
+        params = (
+            "" if start is None else self.__to_sql(pd.Timestamp(start)),
+            "9999-12-31" if end is None else self.__to_sql(pd.Timestamp(end)),
+        )
+        with self._lock:
+            df = pd.read_sql_query(query, self._connection, params=params)
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def import_csv(self, csv_path: Path) -> int:
+        """Upserts every row of an existing csv history (with its journal) into the database."""
+        df = JournalStorage(csv_path, self._logger).load(self._columns)
+        self._logger.info(f"Importing {len(df)} rows from {csv_path} to {self.data_path}")
+        self.upsert(df.to_dict("records"))
+        return len(df)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __create_table(self, columns: list) -> None:
+        self._columns = list(columns)
+        definitions = ", ".join(
+            '"date" TEXT PRIMARY KEY' if c == "date" else f'"{c}"' for c in columns
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ({definitions})"
+            )
+
+    @staticmethod
+    def __to_sql(value):
+        if isinstance(value, datetime.date):
+            return value.strftime("%Y-%m-%d")
+        if isinstance(value, str):
+            return pd.Timestamp(value).strftime("%Y-%m-%d")
+        # numpy scalars -> plain python values
+        return value.item() if hasattr(value, "item") else value
+
+
+class PartitionedStorage:
+    """
+    Keeps the history in a directory with one csv file per month (`2023-01.csv`) and a manifest
+    (`manifest.json`) with the rows and the date bounds of every partition.
+    Months before the current one are closed and stored gzip compressed (`2023-01.csv.gz`),
+    months that closed since they were written are compressed on `close`.
+    Saving a day rewrites only the partition of its month, range queries read only
+    the partitions overlapping the range. If the directory is new and a csv file with
+    the same name exists next to it, the csv is imported once.
+    `load` reads only the months from the current one on (`loaded_from`), closed months are
+    read through `read_range` when they are needed. The manifest also keeps the `checksum`
+    of every partition, so saved statistics can be checked without reading the closed months.
+
+    Args:
+        `data_path`: Path to the directory. If it does not exist, it will be created.
+        `logger`: Logger for this class.
+    """
+
+    SUFFIXES = (".parts",)
+    MANIFEST = "manifest.json"
+    supports_ranges = True
+
+    def __init__(self, data_path: Path, logger: Logger) -> None:
+        self.data_path = Path(data_path)
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._created = not self.data_path.exists()
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        self._columns: list = None
+        self._manifest = self.__read_manifest()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.data_path / self.MANIFEST
+
+    @property
+    def partitions(self) -> dict:
+        """`{month: {"file", "rows", "first", "last"}}` of every stored month, e.g. `"2023-01"`."""
+        return self._manifest["partitions"]
+
+    def load(self, columns: list) -> pd.DataFrame:
+        self._columns = list(columns)
+        csv_path = self.data_path.with_suffix(".csv")
+        if self._created and csv_path.exists():
+            self.import_csv(csv_path)
+        self.loaded_from = pd.Timestamp.today().normalize().replace(day=1)
+        self._logger.debug(
+            f"Loading the months from {self.loaded_from:%Y-%m} on from {self.data_path}"
+        )
+        return self.read_range(self.loaded_from)
+
+    def checksum(self, fields: list) -> np.ndarray:
+        """Sum of the `checksum` of every partition, `None` if a partition was written without one
+        or for other fields."""
+        empty = pd.DataFrame({c: pd.Series(dtype=float) for c in ["date", *fields]})
+        total = tracker_state.checksum(empty, fields)
+        with self._lock:
+            columns = self._manifest.get("columns") or []
+            if [c for c in columns if c != "date"] != list(fields):
+                return None
+            for entry in self.partitions.values():
+                if "checksum" not in entry:
+                    return None
+                total = total + np.array(entry["checksum"])
+        return total
+
+    def save(self, snapshot, record: dict) -> None:
+        self.save_many(snapshot, [record])
+
+    def save_many(self, snapshot, records: list) -> None:
+        self._logger.info(f"Saving {len(records)} record(s) to {self.data_path}")
+        self.upsert(records)
+
+    def upsert(self, records: list) -> None:
+        """Writes `records`, rewriting once every month they touch."""
+        df = pd.DataFrame(records, columns=self._columns)
+        df["date"] = pd.to_datetime(df["date"]).dt.normalize()
+        with self._lock:
+            for month, rows in df.groupby(df["date"].dt.strftime("%Y-%m")):
+                if month in self.partitions:
+                    part = pd.concat([self.__read_partition(month), rows], ignore_index=True)
+                    part = part.drop_duplicates(subset="date", keep="last")
+                else:
+                    part = rows
+                self.__write_partition(month, part.sort_values(by="date", kind="stable"))
+            self.__write_manifest()
+
+    def delete_many(self, snapshot, dates: list) -> None:
+        """Removes the days of `dates`, rewriting once every month they touch.
+        Months left without days lose their partition."""
+        self._logger.info(f"Removing {len(dates)} day(s) from {self.data_path}")
+        dates = pd.Series(pd.to_datetime(dates)).dt.normalize()
+        with self._lock:
+            for month, days in dates.groupby(dates.dt.strftime("%Y-%m")):
+                if month not in self.partitions:
+                    continue
+                part = self.__read_partition(month)
+                part = part[~part["date"].isin(days)]
+                if len(part):
+                    self.__write_partition(month, part)
+                else:
+                    (self.data_path / self.partitions.pop(month)["file"]).unlink(missing_ok=True)
+            self.__write_manifest()
+
+    def read_range(self, start=None, end=None, fields: list = None) -> pd.DataFrame:
+        """Returns rows with `start <= date <= end` sorted by date. Missing bounds are open.
+        Only the partitions overlapping the range are read."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        columns = self._columns if fields is None else list(dict.fromkeys(["date", *fields]))
+        with self._lock:
+            # the writer thread updates the manifest entries
+            months = [
+                month
+                for month, entry in sorted(self.partitions.items())
+                if (start is None or pd.Timestamp(entry["last"]) >= start)
+                and (end is None or pd.Timestamp(entry["first"]) <= end)
+            ]
+            parts = [self.__read_partition(month, columns) for month in months]
+        if not parts:
+            return pd.DataFrame(
+                {c: pd.Series(dtype="datetime64[ns]" if c == "date" else float) for c in columns}
+            )
+        df = pd.concat(parts, ignore_index=True)
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= (df["date"] >= start).to_numpy()
+        if end is not None:
+            mask &= (df["date"] <= end).to_numpy()
+        return df[mask].reset_index(drop=True)
+
+    def import_csv(self, csv_path: Path) -> int:
+        """Splits an existing csv history (with its journal) into partitions."""
+        df = JournalStorage(csv_path, self._logger).load(self._columns)
+        self._logger.info(f"Importing {len(df)} rows from {csv_path} to {self.data_path}")
+        self.upsert(df.to_dict("records"))
+        return len(df)
+
+    def close(self) -> None:
+        self.__close_months()
+
+    def __close_months(self) -> None:
+        """Compresses the partitions of the months before the current one."""
+        current = pd.Timestamp.today().strftime("%Y-%m")
+        with self._lock:
+            closed = [
+                month
+                for month, entry in self.partitions.items()
+                if month < current and not entry["file"].endswith(".gz")
+            ]
+            for month in closed:
+                self._logger.debug(f"Compressing closed partition {month}")
+                self.__write_partition(month, self.__read_partition(month))
+            if closed:
+                self.__write_manifest()
+
+    def __partition_file(self, month: str) -> str:
+        closed = month < pd.Timestamp.today().strftime("%Y-%m")
+        return f"{month}.csv.gz" if closed else f"{month}.csv"
+
+    def __read_partition(self, month: str, columns: list = None) -> pd.DataFrame:
+        path = self.data_path / self.partitions[month]["file"]
+        df = pd.read_csv(path, usecols=columns, parse_dates=["date"])
+        return df if columns is None else df[columns]
+
+    def __write_partition(self, month: str, df: pd.DataFrame) -> None:
+        name = self.__partition_file(month)
+        path = self.data_path / name
+        tmp_path = path.with_name(path.name + ".tmp")
+        compression = "gzip" if name.endswith(".gz") else None
+        df.to_csv(tmp_path, index=False, compression=compression)
+        os.replace(tmp_path, path)
+        old = self.partitions.get(month)
+        if old is not None and old["file"] != name:
+            # the month was closed since it was last written
+            (self.data_path / old["file"]).unlink(missing_ok=True)
+        self.partitions[month] = {
+            "file": name,
+            "rows": len(df),
+            "first": df["date"].min().strftime("%Y-%m-%d"),
+            "last": df["date"].max().strftime("%Y-%m-%d"),
+            "checksum": tracker_state.checksum(
+                df, [c for c in self._columns if c != "date"]
+            ).tolist(),
+        }
+
+    def __read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {"partitions": {}}
+        return json.loads(self.manifest_path.read_text())
+
+    def __write_manifest(self) -> None:
+        # the manifest is swapped in last, it always lists complete partitions
+        self._manifest["columns"] = self._columns
+        tmp_path = self.manifest_path.with_name(self.MANIFEST + ".tmp")
+        tmp_path.write_text(json.dumps(self._manifest, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.manifest_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Import a csv history into sqlite.")
+    parser.add_argument("csv_path", type=Path)
+    parser.add_argument("db_path", type=Path)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    storage = SqliteStorage(args.db_path, logging.getLogger("storage"))
+    storage.load(pd.read_csv(args.csv_path, nrows=0).columns.tolist())
+    storage.import_csv(args.csv_path)
+    storage.close()
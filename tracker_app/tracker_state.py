@@ -0,0 +1,82 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from logging import Logger
+
+
+def checksum(df: pd.DataFrame, fields: list) -> np.ndarray:
+    """Number of rows, sums, sums of squares and sums weighted by the day number of `fields`,
+    and the sum of the day numbers. Sums of parts add up to the sum of the whole,
+    so a storage can compute it without reading every row."""
+    days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(float)
+    values = df[fields].to_numpy(dtype=float)
+    return np.concatenate(
+        [
+            [len(df)],
+            values.sum(axis=0),
+            (values**2).sum(axis=0),
+            days @ values,
+            [days.sum()],
+        ]
+    )
+
+
+def totals(checksum: np.ndarray, fields: list, wanted: list) -> tuple:
+    """`(count, sums, squares)` of the `wanted` fields out of a `checksum` of `fields`."""
+    size = len(fields)
+    order = [fields.index(field) for field in wanted]
+    return checksum[0], checksum[1 : 1 + size][order], checksum[1 + size : 1 + 2 * size][order]
+
+
+class TrackerState:
+    """
+    Statistics, habits and correlations saved on close next to the data file
+    (`<data_path>.trackers.pkl`), so the next start restores them instead of rebuilding them
+    from the whole history. The file is tagged with the `checksum` of the data it was built
+    from and only used while the loaded data still has the same checksum.
+
+    Args:
+        `path`: Path to the state file.
+        `logger`: Logger for this class.
+    """
+
+    def __init__(self, path: Path, logger: Logger) -> None:
+        self.path = Path(path)
+        self._logger = logger
+
+    def load(self, fields: list, checksum: np.ndarray) -> dict:
+        """Returns `{name: tracker}` saved for `fields` and `checksum`, `None` if there is none."""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "rb") as file:
+                state = pickle.load(file)
+            if state["fields"] != list(fields):
+                return None
+            # the running sums were added up in another order, they match up to rounding
+            if len(state["checksum"]) != len(checksum) or not np.allclose(
+                state["checksum"], checksum, rtol=1e-9, atol=1e-6
+            ):
+                self._logger.debug(f"Tracker state {self.path} is stale.")
+                return None
+        except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError, AttributeError) as exc:
+            self._logger.warning(f"Could not read tracker state {self.path}: {exc}")
+            return None
+        self._logger.debug(f"Restored trackers from {self.path}.")
+        return state["trackers"]
+
+    def save(self, fields: list, checksum: np.ndarray, trackers: dict) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as file:
+                pickle.dump(
+                    {"fields": list(fields), "checksum": checksum, "trackers": trackers},
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            self._logger.warning(f"Could not write tracker state {self.path}: {exc}")
+            tmp_path.unlink(missing_ok=True)
@@ -1,5 +1,7 @@
+import sys
+import time
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 class Colors(Enum):
     PRIMARY = "#F2CC8F"
@@ -18,4 +20,33 @@ class Config:
     date: str = "2021-01-01"
 
 
+@dataclass
+class StartupTimer:
+    """
+    Measures how long each startup phase takes. Enabled with the `--startup-report` flag.
+    The report also lists which heavy modules were already imported, so a plotting library
+    sneaking back into the startup path is visible. For per module times run with `python -X importtime`.
+    """
+
+    enabled: bool = False
+    heavy_modules: tuple = ("pandas", "matplotlib", "seaborn", "flet.matplotlib_chart")
+    started: float = field(default_factory=time.perf_counter)
+    marks: list = field(default_factory=list)
+
+    def mark(self, phase: str) -> None:
+        self.marks.append((phase, time.perf_counter()))
+
+    def report(self) -> str:
+        lines, previous = [], self.started
+        for phase, moment in self.marks:
+            lines.append(
+                f"{phase:<15}: {(moment - previous) * 1000:8.1f} ms (total {(moment - self.started) * 1000:8.1f} ms)"
+            )
+            previous = moment
+        for module in self.heavy_modules:
+            lines.append(f"{module:<25} loaded: {module in sys.modules}")
+        return "\n".join(lines)
+
+
 CONFIG = Config()
+STARTUP = StartupTimer(enabled="--startup-report" in sys.argv)
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from schema import Schema, SCHEMA
+
+
+@dataclass(frozen=True)
+class RangeRule:
+    """`field` has to be within `[min, max]`, an open bound is `None`."""
+
+    field: str
+    min: float = None
+    max: float = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.field}_range"
+
+    @property
+    def fields(self) -> tuple:
+        return (self.field,)
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Returns `True` for every row of `df` breaking the rule."""
+        values = df[self.field].to_numpy(dtype=float)
+        bad = np.isnan(values)
+        if self.min is not None:
+            bad |= values < self.min
+        if self.max is not None:
+            bad |= values > self.max
+        return bad
+
+    def __str__(self) -> str:
+        return f"{self.field} has to be between {self.min} and {self.max}"
+
+
+@dataclass(frozen=True)
+class SumRule:
+    """The values of `fields` have to add up to at most `max`."""
+
+    name: str
+    fields: tuple
+    max: float
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        values = df[list(self.fields)].to_numpy(dtype=float)
+        return values.sum(axis=1) > self.max
+
+    def __str__(self) -> str:
+        return f"{' + '.join(self.fields)} has to be at most {self.max}"
+
+
+@dataclass
+class ValidationReport:
+    """
+    Result of `Validator.check`.
+
+    Args:
+        `violations`: `{rule: index labels of the rows breaking it}`, only rules that failed.
+    """
+
+    violations: dict = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        """`True` if every row passed."""
+        return not self.violations
+
+    @property
+    def rows(self) -> list:
+        """Index labels of every offending row, sorted."""
+        return sorted({row for rows in self.violations.values() for row in rows})
+
+    @property
+    def fields(self) -> list:
+        """Fields involved in any broken rule."""
+        return list(dict.fromkeys(f for rule in self.violations for f in rule.fields))
+
+    def __str__(self) -> str:
+        if not self.violations:
+            return "All rows are valid."
+        return "\n".join(
+            f"{rule.name}: {rule} (rows: {list(rows)})" for rule, rows in self.violations.items()
+        )
+
+
+class ValidationError(ValueError):
+    """Raised when days break validation rules, `report` tells which rules and rows."""
+
+    def __init__(self, message: str, report: ValidationReport) -> None:
+        super().__init__(message)
+        self.report = report
+
+    def messages(self, field: str = None) -> list:
+        """Descriptions of the broken rules, only the ones involving `field` if given."""
+        return [str(rule) for rule in self.report.violations if field is None or field in rule.fields]
+
+
+class Validator:
+    """
+    Checks whole frames against the ranges and rules of a schema. Each rule is evaluated
+    as a numpy mask over its columns, so a check costs a few vector operations
+    no matter how many rows are validated, and every offending row is reported at once.
+
+    Args:
+        `rules`: Rules to check, objects with `name`, `fields`, `mask(df)`.
+    """
+
+    def __init__(self, rules: list) -> None:
+        self.rules = list(rules)
+
+    @classmethod
+    def from_schema(cls, schema: Schema = SCHEMA) -> "Validator":
+        """Range rules from the `min`/`max` of the fields, followed by the schema `rules`."""
+        rules = [
+            RangeRule(f.name, f.min, f.max)
+            for f in schema
+            if f.min is not None or f.max is not None
+        ]
+        for name, spec in schema.rules.items():
+            if "sum" not in spec:
+                raise ValueError(f"Unknown kind of rule {name}: {spec}")
+            rules.append(SumRule(name, tuple(spec["sum"]), spec["max"]))
+        return cls(rules)
+
+    def check(self, df: pd.DataFrame) -> ValidationReport:
+        violations = {}
+        for rule in self.rules:
+            bad = rule.mask(df)
+            if bad.any():
+                violations[rule] = df.index[bad].tolist()
+        return ValidationReport(violations)
+
+
+VALIDATOR = Validator.from_schema(SCHEMA)
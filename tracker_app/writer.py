@@ -0,0 +1,145 @@
+import time
+import threading
+from logging import Logger
+
+
+class BackgroundWriter:
+    """
+    Writes saved records in a background thread, so disk latency never blocks the ui.
+    Pending records are kept by key (the date), a newer record replaces the pending one
+    of the same day. They are written as one batch once no record was submitted
+    for `delay` seconds, or right away on `flush`/`close`.
+    A failed batch is kept and retried after another `delay`. After `retries` failures
+    in a row the writer gives up on it, the records are kept in `failed` and go out again
+    with the next submitted record.
+
+    Args:
+        `write`: Callable writing a list of records.
+        `logger`: Logger for this class.
+        `delay`: Debounce time in seconds.
+        `retries`: Number of failed attempts before giving up on a batch.
+    """
+
+    def __init__(self, write, logger: Logger, delay: float = 0.5, retries: int = 5) -> None:
+        self.delay = delay
+        self.retries = retries
+        self._write = write
+        self._logger = logger
+        self._pending = {}
+        self._failed = {}
+        self._attempts = 0
+        self._submitted = 0.0
+        self._writing = False
+        self._flush = False
+        self._closed = False
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, record) -> None:
+        self.submit_many({key: record})
+
+    def submit_many(self, records: dict) -> None:
+        """Submits `{key: record}` at once, so they are written in the same batch."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Writer is closed.")
+            # records given up on get another chance, newer ones win
+            self._pending = {**self._failed, **self._pending, **records}
+            self._failed = {}
+            self._submitted = time.monotonic()
+            self._changed.notify_all()
+
+    def add_listener(self, listener) -> None:
+        """`listener()` is called from the writer thread after every written batch."""
+        self._listeners.append(listener)
+
+    @property
+    def idle(self) -> bool:
+        """`True` if every submitted record is written."""
+        with self._lock:
+            return not self._pending and not self._writing
+
+    @property
+    def failed(self) -> dict:
+        """Records the writer gave up on, by key."""
+        with self._lock:
+            return dict(self._failed)
+
+    def is_pending(self, key) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def flush(self, timeout: float = None) -> bool:
+        """Writes the pending records now and waits for them. Returns `False` on timeout
+        or if records could not be written."""
+        with self._lock:
+            self._flush = True
+            self._changed.notify_all()
+            done = self._changed.wait_for(
+                lambda: not self._pending and not self._writing, timeout
+            )
+            return done and not self._failed
+
+    def close(self, timeout: float = None) -> bool:
+        """Flushes and stops the thread. Returns `False` if records could not be written in time."""
+        flushed = self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+        self._thread.join(timeout)
+        return flushed
+
+    def __next_batch(self) -> dict:
+        with self._lock:
+            while True:
+                if self._pending:
+                    remaining = self._submitted + self.delay - time.monotonic()
+                    if self._flush or self._closed or remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                elif self._closed:
+                    return None
+                else:
+                    self._flush = False
+                    self._changed.wait()
+            batch, self._pending = self._pending, {}
+            self._writing = True
+            return batch
+
+    def __run(self) -> None:
+        while True:
+            batch = self.__next_batch()
+            if batch is None:
+                return
+            try:
+                self._write(list(batch.values()))
+                written = True
+            except Exception as exc:
+                self._logger.error(f"Writing {len(batch)} records failed: {exc}")
+                written = False
+            with self._lock:
+                self._attempts = 0 if written else self._attempts + 1
+                if not written and self._attempts >= self.retries:
+                    self._logger.error(f"Giving up on {len(batch)} records after {self._attempts} attempts.")
+                    self._failed = {**self._failed, **batch}
+                    self._attempts = 0
+                elif not written:
+                    # newer records submitted meanwhile win over the failed ones
+                    self._pending = {**batch, **self._pending}
+                    self._submitted = time.monotonic()
+                    self._flush = False
+                self._writing = False
+                self._changed.notify_all()
+                if not written and self._closed:
+                    self._logger.error(f"Giving up on {len(self._pending)} unwritten records.")
+                    self._failed = {**self._failed, **self._pending}
+                    self._pending = {}
+                    self._changed.notify_all()
+                    return
+            if written:
+                self._logger.debug(f"Wrote {len(batch)} records")
+                for listener in self._listeners:
+                    listener()